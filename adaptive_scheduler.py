@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应轮询调度模块
+根据最近的订单到达速率和营业时间决定下一次抓取的间隔：
+高峰期缩短间隔，空闲时逐步退避，并限制在下限和上限之间
+"""
+
+import time
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from utils.config import load_config_section
+
+DEFAULT_SCHEDULER_CONFIG = {
+    'enabled': True,
+    'min_interval': 5,
+    'max_interval': 300,
+    'business_max_interval': 60,
+    'off_hours_min_interval': 60,
+    'business_hours': ['10:00-14:00', '17:00-21:00'],
+    'target_orders_per_poll': 1,
+    'backoff_factor': 1.5,
+    'ewma_alpha': 0.3,
+    'history_size': 200,
+}
+
+
+def load_scheduler_config(config_file: str = 'config.json') -> Dict:
+    """读取scheduler配置段"""
+    return load_config_section('scheduler', DEFAULT_SCHEDULER_CONFIG, config_file, name='调度')
+
+
+def _parse_hours(ranges: List[str]):
+    """把 ['10:00-14:00'] 解析为 [(600, 840)]（当天的分钟数）"""
+    parsed = []
+    for item in ranges:
+        start, end = item.split('-')
+        start_h, start_m = map(int, start.split(':'))
+        end_h, end_m = map(int, end.split(':'))
+        parsed.append((start_h * 60 + start_m, end_h * 60 + end_m))
+    return parsed
+
+
+class AdaptiveScheduler:
+    def __init__(self, initial_interval: float = 10, config: Optional[Dict] = None):
+        self.logger = logging.getLogger(__name__)
+        config = dict(DEFAULT_SCHEDULER_CONFIG, **(config or {}))
+        self.enabled = bool(config['enabled'])
+        self.min_interval = float(config['min_interval'])
+        self.max_interval = float(config['max_interval'])
+        self.business_max_interval = float(config['business_max_interval'])
+        self.off_hours_min_interval = float(config['off_hours_min_interval'])
+        self.business_hours = _parse_hours(config['business_hours'])
+        self.target_orders_per_poll = float(config['target_orders_per_poll'])
+        self.backoff_factor = float(config['backoff_factor'])
+        self.ewma_alpha = float(config['ewma_alpha'])
+
+        self.initial_interval = float(initial_interval)
+        self.interval = self._clamp(self.initial_interval, self.min_interval, self.max_interval)
+        self.rate = 0.0  # 订单/秒的指数加权平均
+        self.last_poll: Optional[float] = None
+        self.last_new_orders = 0
+        self.history = deque(maxlen=int(config['history_size']))
+
+    @classmethod
+    def from_config(cls, initial_interval: float = 10, config_file: str = 'config.json'):
+        return cls(initial_interval, load_scheduler_config(config_file))
+
+    def in_business_hours(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        return any(start <= minute < end for start, end in self.business_hours)
+
+    def _clamp(self, interval: float, floor: float, ceiling: float) -> float:
+        return max(floor, min(ceiling, interval))
+
+    def record(self, new_orders: int, now: Optional[float] = None):
+        """记录一次抓取得到的新订单数，更新到达速率"""
+        now = now if now is not None else time.time()
+        if self.last_poll is not None and now > self.last_poll:
+            sample = new_orders / (now - self.last_poll)
+            self.rate = self.ewma_alpha * sample + (1 - self.ewma_alpha) * self.rate
+        self.last_poll = now
+        self.last_new_orders = new_orders
+
+    def next_interval(self, now: Optional[datetime] = None) -> float:
+        """计算下一次抓取前应等待的秒数，并记录决策"""
+        now = now or datetime.now()
+        if not self.enabled:
+            self.interval = self.initial_interval
+            self._remember(now, self.interval, False, 'fixed')
+            return self.interval
+
+        business = self.in_business_hours(now)
+        if business:
+            # 营业时间内间隔不超过 business_max_interval，保证订单及时入库
+            floor, ceiling = self.min_interval, self.business_max_interval
+        else:
+            floor, ceiling = max(self.min_interval, self.off_hours_min_interval), self.max_interval
+
+        if self.last_new_orders == 0:
+            # 本轮没有新订单，在上次间隔的基础上退避
+            interval = self.interval * self.backoff_factor
+            reason = 'idle_backoff'
+        elif self.rate > 0:
+            # 有新订单时只收紧不放宽：让每次抓取平均拿到 target_orders_per_poll 条订单
+            interval = min(self.interval, self.target_orders_per_poll / self.rate)
+            reason = 'rate'
+        else:
+            interval = self.interval
+            reason = 'hold'
+
+        self.interval = self._clamp(interval, floor, ceiling)
+        self._remember(now, self.interval, business, reason)
+        return self.interval
+
+    def _remember(self, now: datetime, interval: float, business: bool, reason: str):
+        self.history.append({
+            'time': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'new_orders': self.last_new_orders,
+            'rate_per_minute': round(self.rate * 60, 3),
+            'business_hours': business,
+            'interval': round(interval, 2),
+            'reason': reason,
+        })
+
+    def get_history(self) -> List[Dict]:
+        """返回最近的调度决策，用于调参"""
+        return list(self.history)
+
+    def wait(self, new_orders: int) -> float:
+        """记录本轮结果并睡眠到下一次抓取，返回睡眠秒数"""
+        self.record(new_orders)
+        interval = self.next_interval()
+        self.logger.info(f"⏱️ 下次抓取间隔 {interval:.1f} 秒（{self.history[-1]['reason']}）")
+        time.sleep(interval)
+        return interval
@@ -1,5 +1,5 @@
 from flask import Flask, render_template_string, request, jsonify
-import requests
+from http_client import create_session
 from bs4 import BeautifulSoup
 import os
 import base64
@@ -155,7 +155,7 @@ HTML_TEMPLATE = """
 
 class TonglianAuth:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = create_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
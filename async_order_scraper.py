@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步订单抓取模块
+基于httpx.AsyncClient的OrderScraperRequests异步版本。
+查询参数、游标、指纹、解析和会话状态都复用同一个OrderScraperRequests实例，
+因此同步与异步两条路径的行为保持一致；登录仍走requests会话，在线程中执行
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import httpx
+
+from http_client import LATENCY_STATS, RETRY_STATUS_CODES, backoff_delay, load_http_config
+from order_scraper_requests import OrderScraperRequests, XHR_HEADERS
+from session_state import SessionExpiredError
+
+
+class AsyncOrderScraper:
+    def __init__(self, scraper: Optional[OrderScraperRequests] = None):
+        self.logger = logging.getLogger(__name__)
+        self.scraper = scraper or OrderScraperRequests()
+        self.http_config = load_http_config()
+        self.client: Optional[httpx.AsyncClient] = None
+        self.pending_writes = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """创建连接池，与requests会话使用相同的超时和请求头"""
+        if self.client is None:
+            limits = httpx.Limits(
+                max_connections=max(int(self.http_config['pool_maxsize']), self.scraper.page_workers),
+                max_keepalive_connections=int(self.http_config['pool_maxsize'])
+            )
+            timeout = httpx.Timeout(float(self.http_config['timeout']),
+                                    connect=float(self.http_config['connect_timeout']))
+            self.client = httpx.AsyncClient(
+                headers=dict(self.scraper.session.headers),
+                limits=limits,
+                timeout=timeout,
+                follow_redirects=True
+            )
+            self._sync_cookies()
+        return self.client
+
+    def _sync_cookies(self):
+        """把requests会话中登录得到的Cookie复制到异步客户端"""
+        if self.client is None:
+            return
+        for cookie in self.scraper.session.cookies:
+            self.client.cookies.set(cookie.name, cookie.value, domain=cookie.domain, path=cookie.path)
+
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        """带超时、指数退避重试并记录耗时的GET请求"""
+        client = self._get_client()
+        endpoint = f"GET {httpx.URL(url).path or '/'}"
+        retry_times = int(self.http_config['retry_times'])
+
+        for attempt in range(retry_times + 1):
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, **kwargs)
+            except httpx.TransportError as e:
+                LATENCY_STATS.record(endpoint, time.perf_counter() - start, False, retried=attempt > 0)
+                if attempt >= retry_times:
+                    raise
+                reason = e
+            else:
+                ok = response.status_code < 500
+                LATENCY_STATS.record(endpoint, time.perf_counter() - start, ok, retried=attempt > 0)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= retry_times:
+                    return response
+                reason = f"HTTP {response.status_code}"
+
+            delay = backoff_delay(self.http_config, attempt)
+            self.logger.warning(f"{endpoint} 请求失败（{reason}），{delay:.1f}秒后第{attempt + 1}次重试")
+            await asyncio.sleep(delay)
+
+    async def _fetch_page(self, params: Dict, fingerprint: Optional[Dict] = None):
+        """异步抓取一页订单，解析放到线程中执行，不阻塞事件循环"""
+        scraper = self.scraper
+        if scraper.json_available is not False:
+            response = await self._get(scraper.json_query_url, params=params, headers=XHR_HEADERS)
+            handled, result = await asyncio.to_thread(
+                scraper.handle_json_response, response, params, fingerprint)
+            if handled:
+                return result
+
+        response = await self._get(scraper.orders_url, params=params)
+        scraper.check_session(response)
+        return await asyncio.to_thread(
+            scraper.parse_html_page, response, params.get('pageNum'), fingerprint)
+
+    async def ensure_session(self) -> bool:
+        """会话有效期内不发请求；需要探测或登录时在线程中调用同步登录"""
+        if self.scraper.session_state.is_fresh():
+            return True
+        ok = await asyncio.to_thread(self.scraper.ensure_session)
+        self._sync_cookies()
+        return ok
+
+    async def relogin(self) -> bool:
+        ok = await asyncio.to_thread(self.scraper.login)
+        self._sync_cookies()
+        return ok
+
+    async def fetch_orders(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                           incremental: bool = True) -> List[Dict]:
+        """抓取订单数据，语义与OrderScraperRequests.fetch_orders相同"""
+        scraper = self.scraper
+        try:
+            query = scraper.build_query(start_date, end_date, incremental)
+
+            async def fetch_page(page_num):
+                return await self._fetch_page(*scraper.page_request(query, page_num))
+
+            orders, complete = await scraper.paginator.fetch_all_async(fetch_page, scraper.stop_condition(query))
+            return scraper.finish_query(query, orders, complete)
+
+        except SessionExpiredError:
+            raise
+        except Exception as e:
+            self.logger.error(f"❌ 异步抓取订单异常：{e}")
+            return []
+
+    async def query_orders(self) -> Optional[List[Dict]]:
+        """确保登录后抓取今日订单，会话失效时重新登录并重试一次；登录失败返回None"""
+        if not await self.ensure_session():
+            self.logger.error("❌ 登录失败，无法继续查询")
+            return None
+
+        today = time.strftime("%Y-%m-%d")
+        try:
+            return await self.fetch_orders(today, today)
+        except SessionExpiredError:
+            self.logger.warning("⚠️ 查询时发现会话已失效，重新登录")
+            if not await self.relogin():
+                self.logger.error("❌ 重新登录失败，无法继续查询")
+                return None
+            try:
+                return await self.fetch_orders(today, today)
+            except SessionExpiredError:
+                self.logger.error("❌ 重新登录后会话仍然无效")
+                return None
+
+    def submit_write(self, firebase, orders: List[Dict]) -> asyncio.Task:
+        """放入FirebaseSync的后台写入队列，不等待写入完成，下一轮抓取可以同时进行
+
+        队列满时入队会阻塞，等待返回的任务即可让抓取跟上写入速度
+        """
+        task = asyncio.create_task(asyncio.to_thread(firebase.enqueue_orders, orders))
+        self.pending_writes.add(task)
+        task.add_done_callback(self._on_write_done)
+        return task
+
+    def _on_write_done(self, task: asyncio.Task):
+        self.pending_writes.discard(task)
+        if task.cancelled():
+            return
+        if task.exception():
+            self.logger.error(f"❌ 后台写入Firebase失败：{task.exception()}")
+
+    async def run(self, firebase, matcher, scheduler):
+        """循环抓取；商品匹配后交给后台写入，登录检查和翻页不等待上一轮写入
+
+        scheduler为AdaptiveScheduler，按订单到达速率决定每轮间隔
+        """
+        while True:
+            orders = None
+            try:
+                orders = await self.query_orders()
+                if orders:
+                    for order in orders:
+                        order['matched_products'] = matcher.match_products(order)
+                    await self.submit_write(firebase, orders)
+                    self.logger.info(f"📦 抓取到 {len(orders)} 条新订单，已提交后台写入")
+                # 订单已持久入队才推进游标，入队失败时下一轮重新抓取
+                self.scraper.commit_cursor()
+            except Exception as e:
+                self.logger.error(f"❌ 异步主循环异常：{e}")
+            scheduler.record(len(orders or []))
+            await asyncio.sleep(scheduler.next_interval())
+
+    async def close(self):
+        """等待未完成的写入并关闭连接池"""
+        if self.pending_writes:
+            await asyncio.gather(*self.pending_writes, return_exceptions=True)
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def fetch_orders_sync(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                          incremental: bool = True) -> List[Dict]:
+        """同步调用的薄封装，供没有事件循环的代码使用"""
+        async def _run():
+            try:
+                return await self.fetch_orders(start_date, end_date, incremental)
+            finally:
+                await self.close()
+        return asyncio.run(_run())
+
+
+def main():
+    from dotenv import load_dotenv
+    from firebase_sync import FirebaseSync
+    from product_matcher import ProductMatcher
+    from adaptive_scheduler import AdaptiveScheduler
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+
+    async def _run():
+        async with AsyncOrderScraper() as scraper:
+            scheduler = AdaptiveScheduler.from_config(int(os.getenv("SYNC_INTERVAL", 10)))
+            await scraper.run(firebase, ProductMatcher(), scheduler)
+
+    firebase = FirebaseSync()
+    firebase.start_log_cleanup()
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        print("🛑 已手动停止同步任务")
+    finally:
+        firebase.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史订单补抓模块
+把指定日期范围切分为按天或按小时的时间块，由有限大小的线程池并发抓取并同步到Firebase。
+每完成一个时间块就写入检查点文件，中断后重新运行会跳过已完成的时间块。
+补抓使用独立的限速器，只占用配置中预留的请求额度，不挤占实时轮询。
+"""
+
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from http_client import RateLimiter
+from order_scraper_requests import OrderScraperRequests
+from session_state import SessionExpiredError
+from utils.config import load_config_section, save_json_atomic
+
+DEFAULT_BACKFILL_CONFIG = {
+    'chunk': 'day',
+    'max_workers': 2,
+    'rate_limit_per_second': 1,
+    'checkpoint_file': 'backfill_checkpoint.json',
+}
+
+
+def load_backfill_config(config_file: str = 'config.json') -> Dict:
+    """读取backfill配置段"""
+    return load_config_section('backfill', DEFAULT_BACKFILL_CONFIG, config_file, name='补抓')
+
+
+def split_range(start_date: str, end_date: str, chunk: str = 'day') -> List[Tuple[str, str, str]]:
+    """把 [start_date, end_date] 切分为 (日期, 开始时间, 结束时间) 列表，chunk 为 day 或 hour"""
+    if chunk not in ('day', 'hour'):
+        raise ValueError(f"不支持的切分粒度: {chunk}")
+    day = datetime.strptime(start_date, '%Y-%m-%d')
+    last = datetime.strptime(end_date, '%Y-%m-%d')
+    if last < day:
+        raise ValueError(f"结束日期 {end_date} 早于开始日期 {start_date}")
+
+    chunks = []
+    while day <= last:
+        date = day.strftime('%Y-%m-%d')
+        if chunk == 'day':
+            chunks.append((date, f"{date} 00:00:00", f"{date} 23:59:59"))
+        else:
+            for hour in range(24):
+                chunks.append((date, f"{date} {hour:02d}:00:00", f"{date} {hour:02d}:59:59"))
+        day += timedelta(days=1)
+    return chunks
+
+
+def chunk_key(chunk: Tuple[str, str, str]) -> str:
+    return f"{chunk[1]}~{chunk[2]}"
+
+
+class BackfillCheckpoint:
+    """记录已完成的时间块，键为时间窗口，因此不同的补抓范围可以共用同一个检查点文件"""
+
+    def __init__(self, path: str = 'backfill_checkpoint.json'):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.done: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.done = json.load(f).get('done', {})
+            self.logger.info(f"已加载补抓检查点: {len(self.done)} 个已完成时间块")
+        except Exception as e:
+            self.logger.error(f"加载补抓检查点失败: {str(e)}")
+            self.done = {}
+
+    def save(self):
+        """保存检查点，中断时不会写坏"""
+        try:
+            save_json_atomic(self.path, {'done': self.done}, indent=2)
+        except Exception as e:
+            self.logger.error(f"保存补抓检查点失败: {str(e)}")
+
+    def is_done(self, key: str) -> bool:
+        return key in self.done
+
+    def mark_done(self, key: str, order_count: int):
+        with self._lock:
+            self.done[key] = order_count
+            self.save()
+
+
+class Backfill:
+    def __init__(self, firebase, matcher, scraper: Optional[OrderScraperRequests] = None,
+                 config: Optional[Dict] = None, **overrides):
+        self.logger = logging.getLogger(__name__)
+        self.config = dict(DEFAULT_BACKFILL_CONFIG, **(config or {}))
+        self.config.update({k: v for k, v in overrides.items() if v is not None})
+        self.firebase = firebase
+        self.matcher = matcher
+        # 补抓使用单独的会话和限速器：请求速率不超过预留额度，游标和指纹也不影响实时轮询
+        self.scraper = scraper or OrderScraperRequests(
+            rate_limiter=RateLimiter(float(self.config['rate_limit_per_second'])))
+        self.checkpoint = BackfillCheckpoint(self.config['checkpoint_file'])
+        self._login_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, firebase, matcher, config_file: str = 'config.json', **overrides):
+        return cls(firebase, matcher, config=load_backfill_config(config_file), **overrides)
+
+    def _relogin(self) -> bool:
+        """多个线程同时发现会话失效时只登录一次"""
+        with self._login_lock:
+            if self.scraper.session_state.is_fresh():
+                return True
+            return self.scraper.login()
+
+    def _fetch_chunk(self, chunk: Tuple[str, str, str]) -> Tuple[List[Dict], bool]:
+        """抓取一个时间块，会话失效时重新登录并重试一次，返回 (订单列表, 是否完整抓取)"""
+        date, time_begin, time_end = chunk
+        for attempt in range(2):
+            query = self.scraper.build_query(date, date, time_begin=time_begin, time_end=time_end)
+            try:
+                return self.scraper.run_query(query)
+            except SessionExpiredError:
+                if attempt or not self._relogin():
+                    raise
+        return [], False
+
+    def _process_chunk(self, chunk: Tuple[str, str, str]) -> int:
+        """抓取并同步一个时间块，全部成功后写检查点；返回订单数，失败时抛出异常"""
+        key = chunk_key(chunk)
+        orders, complete = self._fetch_chunk(chunk)
+        if not complete:
+            raise RuntimeError("部分分页抓取失败")
+
+        if orders:
+            for order in orders:
+                order['matched_products'] = self.matcher.match_products(order)
+            result = self.firebase.sync_multiple_orders(orders)
+            if result.get('failed'):
+                raise RuntimeError(f"{result['failed']} 条订单同步失败")
+
+        self.checkpoint.mark_done(key, len(orders))
+        return len(orders)
+
+    def run(self, start_date: str, end_date: Optional[str] = None) -> Dict:
+        """补抓 [start_date, end_date] 的订单，返回统计；失败的时间块不写检查点，重新运行即可续抓"""
+        chunks = split_range(start_date, end_date or start_date, self.config['chunk'])
+        pending = [chunk for chunk in chunks if not self.checkpoint.is_done(chunk_key(chunk))]
+        summary = {'total': len(chunks), 'skipped': len(chunks) - len(pending),
+                   'done': 0, 'failed': [], 'orders': 0}
+        self.logger.info(f"📚 补抓 {start_date} ~ {end_date or start_date}：共 {len(chunks)} 个时间块，"
+                         f"{summary['skipped']} 个已完成，待抓取 {len(pending)} 个")
+        if not pending:
+            return summary
+
+        if not self.scraper.ensure_session():
+            self.logger.error("❌ 登录失败，无法补抓")
+            summary['failed'] = [chunk_key(chunk) for chunk in pending]
+            return summary
+
+        workers = max(1, min(int(self.config['max_workers']), len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._process_chunk, chunk): chunk_key(chunk) for chunk in pending}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    count = future.result()
+                    summary['done'] += 1
+                    summary['orders'] += count
+                    self.logger.info(f"✅ {key}：{count} 条订单"
+                                     f"（进度 {summary['done'] + len(summary['failed'])}/{len(pending)}）")
+                except Exception as e:
+                    summary['failed'].append(key)
+                    self.logger.error(f"❌ {key} 补抓失败：{e}")
+
+        self.logger.info(f"📚 补抓结束：完成 {summary['done']} 个时间块，失败 {len(summary['failed'])} 个，"
+                         f"共 {summary['orders']} 条订单")
+        return summary
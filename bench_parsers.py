@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML解析性能测试脚本
+对比旧的BeautifulSoup完整解析与各表格解析引擎的耗时
+用法: python bench_parsers.py [--rows 1000] [--repeat 20]
+"""
+
+import sys
+import time
+import argparse
+from bs4 import BeautifulSoup
+from order_parser import PARSERS
+
+RECORDED_PAGES = ['login_page.html', 'login_response_debug.html']
+
+
+def build_order_table(rows):
+    """生成带表头的合成订单结果页"""
+    body = ''.join(
+        f"<tr><td>2025061612{i:06d}</td><td>T{i % 8:03d}</td>"
+        f"<td>2025-06-16 12:{(i // 60) % 60:02d}:{i % 60:02d}</td><td>微信支付</td>"
+        f"<td>￥{(48, 20, 68)[i % 3]}.00</td><td>交易成功</td></tr>"
+        for i in range(rows)
+    )
+    return (
+        "<html><head><title>交易查询</title></head><body><div class='query'>交易查询</div>"
+        "<table class='result'><thead><tr><th>商户订单号</th><th>终端号</th><th>交易时间</th>"
+        "<th>支付方式</th><th>交易金额</th><th>交易状态</th></tr></thead>"
+        f"<tbody>{body}</tbody></table><div class='page'>共 {rows} 条</div></body></html>"
+    )
+
+
+def legacy_parse(html):
+    """旧实现：html.parser完整解析 + get_text + select"""
+    soup = BeautifulSoup(html, 'html.parser')
+    soup.get_text()
+    return [
+        [td.get_text(strip=True) for td in tr.find_all('td')]
+        for tr in soup.select("table tbody tr")
+    ]
+
+
+def table_parse(parser):
+    def parse(html):
+        return [row for _, rows in parser.iter_tables(html) for row in rows]
+    return parse
+
+
+def measure(func, html, repeat):
+    """返回 (每次平均毫秒, 解析出的行数)"""
+    rows = func(html)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html)
+    return (time.perf_counter() - start) * 1000 / repeat, len(rows)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='HTML解析性能测试')
+    arg_parser.add_argument('--rows', type=int, default=1000, help='合成订单表行数，默认1000')
+    arg_parser.add_argument('--repeat', type=int, default=20, help='每项重复次数，默认20')
+    args = arg_parser.parse_args()
+
+    candidates = [('bs4-legacy', legacy_parse)]
+    for name, parser_cls in PARSERS.items():
+        try:
+            candidates.append((name, table_parse(parser_cls())))
+        except ImportError:
+            print(f"⚠️  {name} 未安装，跳过")
+
+    samples = []
+    for path in RECORDED_PAGES:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                samples.append((path, f.read()))
+        except FileNotFoundError:
+            print(f"⚠️  找不到 {path}，跳过")
+    samples.append((f"合成订单表 {args.rows} 行", build_order_table(args.rows)))
+
+    print("HTML解析性能测试")
+    print("=" * 60)
+    for label, html in samples:
+        print(f"\n{label} ({len(html)} 字符)")
+        baseline = None
+        for name, func in candidates:
+            avg_ms, row_count = measure(func, html, args.repeat)
+            baseline = baseline or avg_ms
+            print(f"  {name:<12} {avg_ms:9.2f} ms  {row_count:5d} 行  x{baseline / avg_ms:.1f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Playwright浏览器管理模块
+长期保持一个Chromium实例、浏览器上下文和已登录的页面，在多轮抓取之间复用。
+使用次数达到上限或浏览器内存增长超过阈值时回收重启，浏览器崩溃或断开后下次使用时自动重启。
+"""
+
+import os
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from playwright.async_api import async_playwright
+
+from utils.config import load_config_section
+
+DEFAULT_BROWSER_CONFIG = {
+    'executable_path': '/usr/bin/chromium',
+    'headless': True,
+    'max_uses': 200,
+    'max_memory_mb': 800,
+    # 这些类型的请求直接中止，不下载图片、字体和样式表
+    'blocked_resource_types': ['image', 'font', 'stylesheet', 'media'],
+}
+
+
+def load_browser_config(config_file: str = 'config.json') -> Dict:
+    """读取browser配置段"""
+    return load_config_section('browser', DEFAULT_BROWSER_CONFIG, config_file, name='浏览器')
+
+
+def _child_pids(root_pid: int) -> set:
+    """从/proc中找出root_pid的全部子孙进程（Playwright驱动及其启动的Chromium）"""
+    parents = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r') as f:
+                # 进程名可能含空格，ppid取右括号之后的第二个字段
+                parents[int(name)] = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+    found, frontier = set(), {root_pid}
+    while frontier:
+        frontier = {pid for pid, ppid in parents.items() if ppid in frontier and pid not in found}
+        found |= frontier
+    return found
+
+
+def browser_memory_mb() -> Optional[float]:
+    """当前进程启动的浏览器进程占用的常驻内存(MB)，无法读取/proc时返回None"""
+    if not os.path.isdir('/proc'):
+        return None
+    total_kb = 0
+    for pid in _child_pids(os.getpid()):
+        try:
+            with open(f'/proc/{pid}/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+class BrowserManager:
+    """复用同一个浏览器和已登录页面
+
+    setup(context) 在每次新建浏览器上下文后调用一次，负责写入Cookie、打开订单页并返回页面；
+    之后的 get_page() 直接返回这个页面，直到浏览器被回收或重启。
+    """
+
+    def __init__(self, setup: Callable[..., Awaitable], config: Optional[Dict] = None):
+        self.logger = logging.getLogger(__name__)
+        self.setup = setup
+        self.config = dict(DEFAULT_BROWSER_CONFIG, **(config or {}))
+        self.max_uses = int(self.config['max_uses'])
+        self.max_memory_mb = float(self.config['max_memory_mb'])
+        self.blocked_resource_types = set(self.config['blocked_resource_types'] or [])
+        self.blocked_count = 0
+
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.uses = 0
+        self.baseline_memory_mb: Optional[float] = None
+        self.crashed = False
+        self.restart_count = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """启动浏览器并新建上下文和已登录页面"""
+        if self.playwright is None:
+            self.playwright = await async_playwright().start()
+        launch_options = {'headless': bool(self.config['headless'])}
+        if self.config.get('executable_path'):
+            launch_options['executable_path'] = self.config['executable_path']
+        self.browser = await self.playwright.chromium.launch(**launch_options)
+        self.browser.on('disconnected', self._on_disconnected)
+        self.crashed = False
+        self.context = await self.browser.new_context()
+        if self.blocked_resource_types:
+            await self.context.route('**/*', self._route)
+        self.page = await self.setup(self.context)
+        self.page.on('crash', self._on_page_crash)
+        self.uses = 0
+        self.baseline_memory_mb = browser_memory_mb()
+        self.logger.info("🌐 浏览器已启动")
+
+    async def _route(self, route):
+        if route.request.resource_type in self.blocked_resource_types:
+            self.blocked_count += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _on_disconnected(self, *_):
+        self.crashed = True
+        self.logger.warning("⚠️ 浏览器已断开，下次使用时重启")
+
+    def _on_page_crash(self, *_):
+        self.crashed = True
+        self.logger.warning("⚠️ 页面已崩溃，下次使用时重启浏览器")
+
+    def _recycle_reason(self) -> Optional[str]:
+        if self.browser is None:
+            return '首次启动'
+        if self.crashed or not self.browser.is_connected() or self.page is None or self.page.is_closed():
+            return '浏览器崩溃或页面已关闭'
+        if self.max_uses and self.uses >= self.max_uses:
+            return f'已使用 {self.uses} 次'
+        if self.max_memory_mb and self.baseline_memory_mb is not None:
+            memory = browser_memory_mb()
+            if memory is not None and memory - self.baseline_memory_mb > self.max_memory_mb:
+                return f'内存增长 {memory - self.baseline_memory_mb:.0f}MB'
+        return None
+
+    async def get_page(self):
+        """返回可用的已登录页面，需要时先回收或重启浏览器"""
+        reason = self._recycle_reason()
+        if reason:
+            if self.browser is not None:
+                self.logger.info(f"♻️ 重启浏览器：{reason}")
+                self.restart_count += 1
+            await self._close_browser()
+            try:
+                await self.start()
+            except Exception as e:
+                # Playwright驱动本身退出时需要连同驱动一起重启
+                self.logger.warning(f"启动浏览器失败，重启Playwright后重试: {str(e)}")
+                await self.close()
+                await self.start()
+        self.uses += 1
+        return self.page
+
+    def mark_broken(self):
+        """调用方遇到无法恢复的页面错误时调用，下次get_page()会重启浏览器"""
+        self.crashed = True
+
+    async def _close_browser(self):
+        browser, self.browser, self.context, self.page = self.browser, None, None, None
+        if browser is None:
+            return
+        try:
+            await browser.close()
+        except Exception as e:
+            self.logger.warning(f"关闭浏览器失败: {str(e)}")
+
+    async def close(self):
+        """关闭浏览器和Playwright驱动"""
+        await self._close_browser()
+        if self.playwright is not None:
+            try:
+                await self.playwright.stop()
+            except Exception as e:
+                self.logger.warning(f"停止Playwright失败: {str(e)}")
+            self.playwright = None
+
+    def get_stats(self) -> Dict:
+        return {
+            'uses': self.uses,
+            'restart_count': self.restart_count,
+            'blocked_requests': self.blocked_count,
+            'memory_mb': browser_memory_mb(),
+            'baseline_memory_mb': self.baseline_memory_mb,
+        }
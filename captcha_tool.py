@@ -3,14 +3,14 @@
 验证码获取和登录工具
 """
 
-import requests
+from http_client import create_session
 from bs4 import BeautifulSoup
 import os
 import time
 
 class CaptchaTool:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = create_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
@@ -4,7 +4,7 @@
 帮助用户手动登录并获取有效的Cookie用于自动化脚本
 """
 
-import requests
+from http_client import create_session
 from bs4 import BeautifulSoup
 import os
 from dotenv import load_dotenv
@@ -12,7 +12,7 @@ from dotenv import load_dotenv
 class CookieHelper:
     def __init__(self):
         load_dotenv()
-        self.session = requests.Session()
+        self.session = create_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
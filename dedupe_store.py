@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已同步订单去重存储模块
+用SQLite（WAL模式）持久化已同步的订单号，按订单日期分桶，只保留最近几天；
+进程重启后不需要重新向Firebase确认，长期运行时内存占用也不会随订单数增长。
+同一个数据库中还保存待写入的订单（pending_orders），后台写入失败或进程退出时订单不会丢失。
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS synced_orders (
+    order_id TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_synced_orders_day ON synced_orders (day);
+CREATE TABLE IF NOT EXISTS pending_orders (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    queued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def order_day(create_time) -> str:
+    """订单所属日期桶：取交易时间的日期部分，没有交易时间时按今天"""
+    if create_time:
+        text = str(create_time)
+        if len(text) >= 10 and text[4] == '-' and text[7] == '-':
+            return text[:10]
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+class SyncedOrderStore:
+    """已同步订单号集合，支持 ``in``、``add`` 和按天过期"""
+
+    def __init__(self, path: str = 'synced_orders.db', retention_days: int = 3):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.retention_days = retention_days
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._expired_on = None
+        self.expire()
+
+    def __contains__(self, order_id) -> bool:
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM synced_orders WHERE order_id = ?', (str(order_id),)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM synced_orders').fetchone()[0]
+
+    def add(self, order_id, day: Optional[str] = None):
+        self.add_many([order_id], day)
+
+    def add_many(self, order_ids: Iterable, day: Optional[str] = None):
+        """登记一批已同步订单号，day为订单日期桶（默认今天）"""
+        day = day or order_day(None)
+        now = time.time()
+        rows = [(str(order_id), day, now) for order_id in order_ids]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO synced_orders (order_id, day, synced_at) VALUES (?, ?, ?)', rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        # 跨天后顺便清理过期的日期桶
+        if self._expired_on != day and day == order_day(None):
+            self.expire()
+
+    def _cutoff(self) -> str:
+        return (datetime.now() - timedelta(days=self.retention_days - 1)).strftime('%Y-%m-%d')
+
+    def is_expired_day(self, day: str) -> bool:
+        """该日期桶是否已超出保留期（查不到不代表没有同步过）"""
+        return self.retention_days > 0 and day < self._cutoff()
+
+    def expire(self) -> int:
+        """删除超过保留天数的日期桶，返回删除的订单数"""
+        if self.retention_days <= 0:
+            return 0
+        today = datetime.now()
+        cutoff = self._cutoff()
+        with self._lock:
+            removed = self._conn.execute('DELETE FROM synced_orders WHERE day < ?', (cutoff,)).rowcount
+        self._expired_on = today.strftime('%Y-%m-%d')
+        if removed:
+            self.logger.info(f"🧹 去重库已清理 {cutoff} 之前的 {removed} 个订单号")
+        return removed
+
+    def add_pending(self, items: Iterable[Tuple[str, str]]):
+        """登记待写入的订单 (key, JSON内容)；同一key已在列表中时只更新内容"""
+        now = time.time()
+        rows = [(key, payload, now) for key, payload in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT INTO pending_orders (key, payload, queued_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET payload = excluded.payload', rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def remove_pending(self, keys: Iterable[str]):
+        """订单已写入Firebase，从待写入列表中删除"""
+        rows = [(key,) for key in keys]
+        if rows:
+            with self._lock:
+                self._conn.executemany('DELETE FROM pending_orders WHERE key = ?', rows)
+
+    def mark_pending_failed(self, keys: Iterable[str]):
+        """写入失败，累加失败次数"""
+        rows = [(key,) for key in keys]
+        if rows:
+            with self._lock:
+                self._conn.executemany('UPDATE pending_orders SET attempts = attempts + 1 WHERE key = ?', rows)
+
+    def load_pending(self, limit: int) -> List[Tuple[str, str, int]]:
+        """按入队顺序取出最多limit条待写入订单 (key, JSON内容, 已失败次数)"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT key, payload, attempts FROM pending_orders ORDER BY queued_at LIMIT ?', (limit,)).fetchall()
+
+    def count_pending(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM pending_orders').fetchone()[0]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -6,21 +6,100 @@ Firebase同步模块
 """
 
 import os
+import re
 import json
+import time
+import queue
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 import firebase_admin
 from firebase_admin import credentials, db
 
+from dedupe_store import SyncedOrderStore, order_day
+from http_client import RateLimiter, backoff_delay
+
+# Firebase路径key中不允许出现的字符
+INVALID_KEY_CHARS = re.compile(r'[.$#\[\]/]')
+DAY_KEY = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# orders_auto 的写入方式：order_id 以订单号为key（重复写入即覆盖），timestamp 为旧的时间戳key
+WRITE_MODES = ('order_id', 'timestamp')
+
+# Firebase push id 前8位是毫秒时间戳的64进制编码，字符按ASCII升序排列，因此key的字典序与生成时间一致
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+
+def _increment(value):
+    """Firebase服务端原子自增，多个写入方同时累加也不会丢失"""
+    return {'.sv': {'increment': value}}
+
+
+def push_id_prefix(moment: datetime) -> str:
+    """把时间编码成push id的前8位，早于该时间生成的push id按字典序都小于它"""
+    millis = int(moment.timestamp() * 1000)
+    chars = []
+    for _ in range(8):
+        chars.append(PUSH_CHARS[millis % 64])
+        millis //= 64
+    return ''.join(reversed(chars))
+
+
+def _to_amount(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
 class FirebaseSync:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.db_ref = None
-        self.synced_orders = set()  # 用于去重
+        self._last_key = None
+        self._key_seq = 0
+        self._key_lock = threading.Lock()
+        self._index_lock = threading.Lock()
         
         self._initialize_firebase()
         self._load_config()
+        # 已同步订单号（索引key）持久化在本地SQLite中，只保留最近几天，用于去重；
+        # 首次使用时从Firebase的订单号索引节点导入一次，之后随写入更新
+        self.synced_orders = SyncedOrderStore(self.dedupe_db, self.dedupe_retention_days)
+        self.order_index_loaded = self.synced_orders.get_meta('order_index_loaded_at') is not None
+        
+        # 后台写入队列：enqueue_orders() 先把订单登记到去重库的待写入列表再放入队列，
+        # 由写入线程合并成批量update，首次入队时启动；写入失败的订单留在待写入列表中定期重试
+        self.write_queue = queue.Queue(maxsize=self.write_queue_size)
+        self._flushers: List[threading.Thread] = []
+        self._flusher_lock = threading.Lock()
+        self._closing = False
+        # 已在内存队列中或正在写入的订单key，重试时跳过
+        self._inflight = set()
+        # 连续失败 pending_isolate_attempts 次以上的订单key，逐条单独写入
+        self._isolated = set()
+        self._inflight_lock = threading.Lock()
+        self._last_retry = time.monotonic()
+        pending = self.synced_orders.count_pending()
+        if pending:
+            self.logger.warning(f"⚠️ 有 {pending} 条上次未写入的订单，启动后台写入后重试")
+        self.write_stats = {
+            'enqueued': 0,
+            'flushed': 0,
+            'failed': 0,
+            'retried': 0,
+            'batches': 0,
+            'blocked_seconds': 0.0,
+            'flush_seconds': 0.0,
+            'last_flush_seconds': 0.0,
+        }
+        self._stats_lock = threading.Lock()
+        
+        # 后台日志清理任务及其进度
+        self._cleanup_thread: Optional[threading.Thread] = None
+        self._cleanup_lock = threading.Lock()
+        self._cleanup_stop = threading.Event()
+        self.cleanup_progress = {'running': False, 'deleted': 0, 'pages': 0}
     
     def _initialize_firebase(self):
         """初始化Firebase"""
@@ -66,6 +145,30 @@ class FirebaseSync:
             self.orders_collection = firebase_config.get('orders_collection', 'orders')
             self.products_collection = firebase_config.get('products_collection', 'products')
             self.sync_log_collection = firebase_config.get('sync_log_collection', 'sync_logs')
+            self.order_index_collection = firebase_config.get('order_index_collection', 'order_ids')
+            self.stats_collection = firebase_config.get('stats_collection', 'sync_stats')
+            self.dedupe_db = firebase_config.get('dedupe_db', 'synced_orders.db')
+            self.dedupe_retention_days = int(firebase_config.get('dedupe_retention_days', 3))
+            self.write_mode = firebase_config.get('write_mode', 'order_id')
+            if self.write_mode not in WRITE_MODES:
+                self.logger.error(f"未知的写入方式 {self.write_mode}，使用 order_id")
+                self.write_mode = 'order_id'
+            self.day_shard = bool(firebase_config.get('day_shard', False))
+            self.batch_size = int(firebase_config.get('batch_size', 100))
+            self.batch_retry = {
+                'retry_times': int(firebase_config.get('batch_retry_times', 3)),
+                'retry_delay': float(firebase_config.get('batch_retry_delay', 1)),
+                'retry_max_delay': float(firebase_config.get('batch_retry_max_delay', 30)),
+            }
+            self.write_queue_size = int(firebase_config.get('write_queue_size', 1000))
+            self.flush_workers = int(firebase_config.get('flush_workers', 2))
+            self.flush_linger = float(firebase_config.get('flush_linger', 0.2))
+            self.pending_retry_interval = float(firebase_config.get('pending_retry_interval', 30))
+            self.pending_isolate_attempts = int(firebase_config.get('pending_isolate_attempts', 3))
+            self.log_retention_days = int(firebase_config.get('log_retention_days', 30))
+            self.log_cleanup_batch_size = int(firebase_config.get('log_cleanup_batch_size', 500))
+            self.log_cleanup_rate = float(firebase_config.get('log_cleanup_rate', 2))
+            self.log_cleanup_interval = float(firebase_config.get('log_cleanup_interval', 21600))
             
         except Exception as e:
             self.logger.error(f"加载配置失败: {str(e)}")
@@ -73,56 +176,187 @@ class FirebaseSync:
             self.orders_collection = 'orders'
             self.products_collection = 'products'
             self.sync_log_collection = 'sync_logs'
+            self.order_index_collection = 'order_ids'
+            self.stats_collection = 'sync_stats'
+            self.dedupe_db = 'synced_orders.db'
+            self.dedupe_retention_days = 3
+            self.write_mode = 'order_id'
+            self.day_shard = False
+            self.batch_size = 100
+            self.batch_retry = {'retry_times': 3, 'retry_delay': 1.0, 'retry_max_delay': 30.0}
+            self.write_queue_size = 1000
+            self.flush_workers = 2
+            self.flush_linger = 0.2
+            self.pending_retry_interval = 30.0
+            self.pending_isolate_attempts = 3
+            self.log_retention_days = 30
+            self.log_cleanup_batch_size = 500
+            self.log_cleanup_rate = 2.0
+            self.log_cleanup_interval = 21600.0
+    
+    def _new_key(self) -> str:
+        """按毫秒时间戳生成的写入key，同一毫秒内追加序号避免批量写入时互相覆盖"""
+        key = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+        with self._key_lock:
+            if key == self._last_key:
+                self._key_seq += 1
+                return f"{key}_{self._key_seq:03d}"
+            self._last_key, self._key_seq = key, 0
+        return key
     
     def sync_order(self, order_data: Dict) -> bool:
-        """同步单个订单到Firebase"""
-        try:
-            order_id = order_data.get('order_id')
-            if not order_id:
-                self.logger.warning("订单ID为空，跳过同步")
-                return False
-            
-            # 检查是否已经同步过
-            if order_id in self.synced_orders:
-                self.logger.debug(f"订单 {order_id} 已同步过，跳过")
-                return True
-            
-            # 检查Firebase中是否已存在
-            if self._order_exists(order_id):
-                self.logger.debug(f"订单 {order_id} 在Firebase中已存在，跳过")
-                self.synced_orders.add(order_id)
-                return True
-            
-            # 准备同步数据
-            sync_data = self._prepare_sync_data(order_data)
-            
-            # 写入Firebase到orders_auto路径，使用时间戳作为key
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]  # 精确到毫秒
-            orders_ref = self.db_ref.child('orders_auto')
-            orders_ref.child(timestamp).set(sync_data)
-            
-            # 记录同步日志
-            self._log_sync_operation(order_id, 'success', sync_data)
-            
-            # 添加到已同步集合
-            self.synced_orders.add(order_id)
-            
-            self.logger.info(f"订单 {order_id} 同步成功")
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"同步订单 {order_id} 失败: {str(e)}")
-            self._log_sync_operation(order_id, 'error', {'error': str(e)})
-            return False
+        """同步单个订单到Firebase，已同步过的订单视为成功"""
+        results = self.sync_multiple_orders([order_data])
+        return results['failed'] == 0
+    
+    def _index_key(self, order_id, merchant_id=None) -> str:
+        """订单号索引和去重用的key；多商户时加上商户ID前缀，不同商户的相同订单号互不覆盖"""
+        key = INVALID_KEY_CHARS.sub('_', str(order_id))
+        if merchant_id:
+            return f"{INVALID_KEY_CHARS.sub('_', str(merchant_id))}__{key}"
+        return key
+    
+    def _order_key(self, order_id, create_time=None, merchant_id=None) -> str:
+        """订单在 orders_auto 下的相对路径：[商户ID__]订单号，开启day_shard时为 日期/[商户ID__]订单号"""
+        key = self._index_key(order_id, merchant_id)
+        if self.day_shard:
+            return f"{order_day(create_time)}/{key}"
+        return key
     
-    def _order_exists(self, order_id: str) -> bool:
-        """检查订单是否已存在于Firebase中"""
+    def _iter_stored_orders(self, orders: Dict):
+        """遍历 orders_auto 的内容，返回 (相对路径, 订单)；兼容时间戳key、订单号key和按天分片"""
+        for key, value in (orders or {}).items():
+            if not isinstance(value, dict):
+                continue
+            if value.get('order_id'):
+                yield key, value
+            elif DAY_KEY.match(key):
+                for inner_key, order in value.items():
+                    if isinstance(order, dict) and order.get('order_id'):
+                        yield f"{key}/{inner_key}", order
+    
+    def _load_order_index(self):
+        """加载订单号索引：只取索引节点的key（shallow查询），不下载订单内容
+
+        索引节点还不存在时（升级前写入的数据），读取一次 orders_auto 中的订单号并补写索引
+        """
         try:
-            order_ref = self.db_ref.child(self.orders_collection).child(order_id)
-            return order_ref.get() is not None
+            keys = self.db_ref.child(self.order_index_collection).get(shallow=True)
+            keys = set(keys.keys()) if keys else self._rebuild_order_index()
+            # 历史订单放进今天的日期桶，随保留期自然过期
+            self.synced_orders.add_many(keys)
+            self.synced_orders.set_meta('order_index_loaded_at', datetime.now().isoformat())
+            self.order_index_loaded = True
+            self.logger.info(f"已导入订单号索引: {len(keys)} 个订单")
         except Exception as e:
-            self.logger.error(f"检查订单存在性时出错: {str(e)}")
-            return False
+            self.logger.error(f"加载订单号索引失败，下次检查时重试: {str(e)}")
+    
+    def _rebuild_order_index(self) -> set:
+        """从 orders_auto 中已有的订单重建索引节点"""
+        orders = self.db_ref.child('orders_auto').get() or {}
+        updates = {}
+        for key, order in self._iter_stored_orders(orders):
+            updates[f"{self.order_index_collection}/{self._index_key(order['order_id'], order.get('merchant_id'))}"] = key
+        for start in range(0, len(updates), 500):
+            chunk = dict(list(updates.items())[start:start + 500])
+            ok, error = self._write_batch(chunk)
+            if not ok:
+                raise RuntimeError(f"写入订单号索引失败: {error}")
+        if updates:
+            self.logger.info(f"已从 orders_auto 重建订单号索引: {len(updates)} 个订单")
+        return {path.rsplit('/', 1)[1] for path in updates}
+    
+    def migrate_to_order_keys(self, dry_run: bool = False) -> Dict:
+        """把 orders_auto 中时间戳key的旧订单迁移到订单号key（按当前day_shard设置，多商户订单带商户ID前缀）
+
+        同一订单有多个时间戳节点时保留最早的一个，其余删除；目标节点已存在时只删除旧节点。
+        每个订单的新建、索引更新和旧节点删除放在同一次多路径update中。
+        """
+        stats = {'total': 0, 'already': 0, 'moved': 0, 'duplicates': 0, 'failed': 0}
+        orders = self.db_ref.child('orders_auto').get() or {}
+        entries = sorted(self._iter_stored_orders(orders))
+        stats['total'] = len(entries)
+        
+        present = set()
+        pending = []
+        for key, order in entries:
+            if key == self._order_key(order['order_id'], order.get('createdAt'), order.get('merchant_id')):
+                present.add(key)
+        stats['already'] = len(present)
+        
+        for key, order in entries:
+            new_key = self._order_key(order['order_id'], order.get('createdAt'), order.get('merchant_id'))
+            if key == new_key:
+                continue
+            updates = {f"orders_auto/{key}": None}
+            if order.get('merchant_id'):
+                # 升级前多商户订单的索引没有商户前缀
+                updates[f"{self.order_index_collection}/{self._index_key(order['order_id'])}"] = None
+            if new_key in present:
+                stats['duplicates'] += 1
+            else:
+                updates[f"orders_auto/{new_key}"] = order
+                updates[f"{self.order_index_collection}/{self._index_key(order['order_id'], order.get('merchant_id'))}"] = new_key
+                present.add(new_key)
+                stats['moved'] += 1
+            pending.append(updates)
+        
+        self.logger.info(f"订单迁移{'（演练）' if dry_run else ''}: 共 {stats['total']} 条，已是订单号key {stats['already']} 条，"
+                         f"迁移 {stats['moved']} 条，删除重复 {stats['duplicates']} 条")
+        if dry_run:
+            return stats
+        
+        for start in range(0, len(pending), max(1, self.batch_size)):
+            chunk = pending[start:start + self.batch_size]
+            updates = {}
+            for item in chunk:
+                updates.update(item)
+            ok, error = self._write_batch(updates)
+            if not ok:
+                stats['failed'] += len(chunk)
+                self.logger.error(f"迁移 {len(chunk)} 条订单失败: {error}")
+        if stats['duplicates']:
+            # 删除了重复订单，统计计数需要重新计算
+            self.rebuild_statistics()
+        return stats
+    
+    def _existing_keys(self, orders: List[Dict]) -> set:
+        """返回这批订单中已存在于Firebase的索引key
+
+        近几天的订单只查本地去重库（首次使用时从订单号索引导入一次，每批最多尝试一次）；
+        超出保留期的旧订单（如补抓）本地已过期，按商户对这些key做一次范围查询确认，整批共用查询结果，不逐单读取。
+        按订单号写入时重复写入虽然只是覆盖同一节点，但 sync_stats 的计数会重复累加，因此同样需要确认。
+        """
+        if not self.order_index_loaded:
+            with self._index_lock:
+                if not self.order_index_loaded:
+                    self._load_order_index()
+        existing = set()
+        expired = {}
+        for order in orders:
+            if not order.get('order_id'):
+                continue
+            key = self._pending_key(order)
+            if key in self.synced_orders:
+                existing.add(key)
+            elif self.synced_orders.is_expired_day(order_day(order.get('create_time'))):
+                expired.setdefault(order.get('merchant_id'), set()).add(key)
+        index = self.db_ref.child(self.order_index_collection)
+        for keys in expired.values():
+            try:
+                found = index.order_by_key().start_at(min(keys)).end_at(max(keys)).get() or {}
+                existing.update(keys.intersection(found))
+            except Exception as e:
+                self.logger.error(f"检查订单存在性时出错: {str(e)}")
+        return existing
+    
+    def _remember_synced(self, orders: List[Dict]):
+        """写入成功后按订单日期登记到去重库"""
+        by_day = {}
+        for order in orders:
+            by_day.setdefault(order_day(order.get('create_time')), []).append(self._index_key(order['order_id'], order.get('merchant_id')))
+        for day, keys in by_day.items():
+            self.synced_orders.add_many(keys, day)
     
     def _prepare_sync_data(self, order_data: Dict) -> Dict:
         """准备同步数据"""
@@ -157,6 +391,10 @@ class FirebaseSync:
             'sync_time': datetime.now().isoformat()
         }
         
+        # 多商户时标记订单所属商户
+        if order_data.get('merchant_id'):
+            sync_data['merchant_id'] = order_data['merchant_id']
+        
         return sync_data
     
     def _format_datetime(self, dt) -> Optional[str]:
@@ -171,44 +409,382 @@ class FirebaseSync:
         else:
             return str(dt)
     
-    def _log_sync_operation(self, order_id: str, status: str, data: Dict):
-        """记录同步操作日志"""
+    def new_cycle(self) -> str:
+        """生成一轮同步的ID，同一轮分多次入队或分多批写入的订单汇总到同一条 sync_logs 记录"""
+        return self._new_key()
+    
+    def _build_sync_log(self, cycle: str, written: List[str] = (), skipped: int = 0, failed: int = 0,
+                        failed_ids: List[str] = (), errors: List[str] = ()) -> Dict:
+        """一轮同步在 sync_logs/<cycle> 下的增量写入内容
+
+        计数用服务端自增累加，订单号和错误按key合并，同一轮分几批写入都汇总在同一条记录上；
+        duration_ms 为这一轮开始到最近一次写入的耗时。不重复保存订单内容。
+        """
+        base = f"{self.sync_log_collection}/{cycle}"
+        now = datetime.now()
+        updates = {f"{base}/timestamp": now.isoformat()}
         try:
-            log_data = {
-                'order_id': order_id,
-                'status': status,
-                'timestamp': datetime.now().isoformat(),
-                'data': data
-            }
-            
-            log_ref = self.db_ref.child(self.sync_log_collection)
-            log_ref.push(log_data)
-            
-        except Exception as e:
-            self.logger.error(f"记录同步日志失败: {str(e)}")
+            started = datetime.strptime(cycle[:19], '%Y%m%d_%H%M%S_%f')
+            updates[f"{base}/duration_ms"] = max(0, int((now - started).total_seconds() * 1000))
+        except ValueError:
+            pass
+        for field, count in (('success', len(written)), ('skipped', skipped), ('failed', failed)):
+            if count:
+                updates[f"{base}/{field}"] = _increment(count)
+        for key in written:
+            updates[f"{base}/order_ids/{key}"] = True
+        for key in failed_ids:
+            updates[f"{base}/failed_ids/{key}"] = True
+        for error in errors:
+            updates[f"{base}/errors/{self._new_key()}"] = error
+        return updates
+    
+    def _build_tally_updates(self, tally: Dict[str, Dict]) -> Dict:
+        """把未写入订单的跳过、失败记录合并进各轮日志，失败次数同时计入统计"""
+        updates = {}
+        for cycle, counts in tally.items():
+            updates.update(self._build_sync_log(cycle, skipped=counts['skipped'], failed=counts['failed'],
+                                                failed_ids=counts['failed_ids'], errors=counts['errors']))
+        updates.update(self._build_stats_updates([], sum(counts['failed'] for counts in tally.values())))
+        return updates
+    
+    def _build_updates(self, order_data: Dict) -> Dict:
+        """一个订单及其订单号索引对应的多路径写入内容"""
+        sync_data = self._prepare_sync_data(order_data)
+        self.logger.debug(f"订单 {order_data['order_id']} 同步内容: {sync_data}")
+        if self.write_mode == 'order_id':
+            order_key = self._order_key(order_data['order_id'], order_data.get('create_time'),
+                                        order_data.get('merchant_id'))
+        else:
+            order_key = self._new_key()
+        return {
+            f"orders_auto/{order_key}": sync_data,
+            f"{self.order_index_collection}/{self._index_key(order_data['order_id'], order_data.get('merchant_id'))}": order_key,
+        }
+    
+    def _build_stats_updates(self, orders: List[Dict], failed: int = 0) -> Dict:
+        """本批订单对统计总数和当日汇总的原子增量，和订单放在同一次update中"""
+        now = datetime.now()
+        totals = f"{self.stats_collection}/totals"
+        day = f"{self.stats_collection}/days/{now.strftime('%Y-%m-%d')}"
+        updates = {}
+        if orders:
+            amount = round(sum(_to_amount(order.get('amount')) for order in orders), 2)
+            updates.update({
+                f"{totals}/orders": _increment(len(orders)),
+                f"{totals}/amount": _increment(amount),
+                f"{totals}/last_sync_time": now.isoformat(),
+                f"{day}/orders": _increment(len(orders)),
+                f"{day}/amount": _increment(amount),
+            })
+        if failed:
+            updates[f"{totals}/errors"] = _increment(failed)
+            updates[f"{day}/errors"] = _increment(failed)
+        return updates
     
-    def sync_multiple_orders(self, orders: List[Dict]) -> Dict:
-        """批量同步订单"""
+    def _write_batch(self, updates: Dict) -> Tuple[bool, Optional[str]]:
+        """一次多路径update写入整批数据，失败时指数退避重试；返回 (是否成功, 最后一次错误)"""
+        retry_times = self.batch_retry['retry_times']
+        error = None
+        for attempt in range(retry_times + 1):
+            try:
+                self.db_ref.update(updates)
+                return True, None
+            except Exception as e:
+                error = str(e)
+                if attempt < retry_times:
+                    delay = backoff_delay(self.batch_retry, attempt)
+                    self.logger.warning(f"批量写入失败（{error}），{delay:.1f}秒后第{attempt + 1}次重试")
+                    time.sleep(delay)
+        return False, error
+    
+    def sync_multiple_orders(self, orders: List[Dict], cycle: Optional[str] = None) -> Dict:
+        """批量同步订单
+
+        订单按 batch_size 分块，每块合并为一次多路径update写入，
+        整块失败时重试，重试仍失败则该块订单计为失败，下次同步时重新写入。
+        同步日志按轮汇总在 sync_logs/<轮次ID> 下：订单带 sync_cycle（enqueue_orders设置）时记入所属轮次，
+        否则本次调用算一轮（可用cycle指定）。日志增量和统计计数器（sync_stats）的增量与订单放在同一次update中。
+        """
+        default_cycle = cycle or self.new_cycle()
         results = {
             'success': 0,
             'failed': 0,
             'skipped': 0,
-            'errors': []
+            'errors': [],
+            'failed_orders': []
         }
+        # 各轮还没有随订单写入日志的跳过/失败记录
+        tally = {}
         
+        def note(order, skipped=0, failed=0, error=None):
+            counts = tally.setdefault(order.get('sync_cycle') or default_cycle,
+                                      {'skipped': 0, 'failed': 0, 'failed_ids': [], 'errors': []})
+            counts['skipped'] += skipped
+            counts['failed'] += failed
+            if failed and order.get('order_id'):
+                counts['failed_ids'].append(self._pending_key(order))
+            if error and error not in counts['errors']:
+                counts['errors'].append(error)
+        
+        # 先过滤掉无效和已同步的订单
+        pending = []
+        pending_ids = set()
+        existing = self._existing_keys(orders)
         for order in orders:
+            order_id = order.get('order_id')
+            if not order_id:
+                self.logger.warning("订单ID为空，跳过同步")
+                results['failed'] += 1
+                note(order, failed=1, error="订单ID为空")
+                continue
+            key = self._index_key(order_id, order.get('merchant_id'))
+            if key in pending_ids or key in existing:
+                results['skipped'] += 1
+                note(order, skipped=1)
+                continue
+            pending_ids.add(key)
+            pending.append(order)
+        
+        batch_size = max(1, self.batch_size)
+        chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        for number, chunk in enumerate(chunks, 1):
+            updates = {}
             try:
-                if self.sync_order(order):
-                    results['success'] += 1
-                else:
-                    results['failed'] += 1
+                for order in chunk:
+                    updates.update(self._build_updates(order))
             except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"订单 {order.get('order_id', 'unknown')}: {str(e)}")
+                error = f"第{number}批准备数据失败: {str(e)}"
+                results['failed'] += len(chunk)
+                results['errors'].append(error)
+                for order in chunk:
+                    note(order, failed=1, error=error)
+                continue
+            updates.update(self._build_stats_updates(chunk))
+            by_cycle = {}
+            for order in chunk:
+                by_cycle.setdefault(order.get('sync_cycle') or default_cycle, []).append(self._pending_key(order))
+            for order_cycle, keys in by_cycle.items():
+                updates.update(self._build_sync_log(order_cycle, written=keys))
+            last = number == len(chunks)
+            if last and tally:
+                # 之前的跳过和失败记录随最后一块订单一起提交；写入失败时下面单独补写
+                updates.update(self._build_tally_updates(tally))
+            
+            ok, error = self._write_batch(updates)
+            if ok:
+                self._remember_synced(chunk)
+                results['success'] += len(chunk)
+                if last:
+                    tally = {}
+            else:
+                message = f"第{number}批 {len(chunk)} 条订单写入失败: {error}"
+                results['failed'] += len(chunk)
+                results['failed_orders'].extend(chunk)
+                results['errors'].append(message)
+                for order in chunk:
+                    note(order, failed=1, error=message)
+                self.logger.error(f"批量写入 {len(chunk)} 条订单失败: {error}")
+        
+        # 只有跳过时不记日志；有失败未能随订单提交时单独写入
+        if any(counts['failed'] for counts in tally.values()):
+            ok, error = self._write_batch(self._build_tally_updates(tally))
+            if not ok:
+                self.logger.error(f"记录同步日志失败: {error}")
         
-        self.logger.info(f"批量同步完成: 成功 {results['success']}, 失败 {results['failed']}")
+        self.logger.info(f"批量同步完成: 成功 {results['success']}, 失败 {results['failed']}, "
+                         f"跳过 {results['skipped']}")
         return results
     
+    def _pending_key(self, order: Dict) -> str:
+        return self._index_key(order['order_id'], order.get('merchant_id'))
+    
+    def enqueue_orders(self, orders: List[Dict], timeout: Optional[float] = None,
+                       cycle: Optional[str] = None) -> int:
+        """把订单交给后台写入并返回接收的数量；返回后订单已持久化，进程退出也不会丢失
+
+        订单先写入本地待写入列表，再放入内存队列；队列已满时阻塞调用方（最多timeout秒），
+        让抓取速度跟上写入速度。超时未能入队的订单留在待写入列表中，由写入线程稍后重试。
+        cycle 为本轮同步ID（默认每次调用一轮），写入线程按它把分批写入的日志汇总成一条。
+        """
+        if self._closing:
+            raise RuntimeError("Firebase同步服务已关闭，不能再写入")
+        valid = [order for order in orders if order.get('order_id')]
+        if len(valid) < len(orders):
+            self.logger.warning(f"{len(orders) - len(valid)} 条订单ID为空，跳过同步")
+        cycle = cycle or self.new_cycle()
+        for order in valid:
+            order['sync_cycle'] = cycle
+        # 先启动写入线程（首次启动时重试上次遗留的订单），再登记本批订单，避免本批被当作遗留订单重试；
+        # 本批订单登记前先标记为写入中，定期重试也不会重复放入
+        self._start_flushers()
+        fresh = []
+        with self._inflight_lock:
+            for order in valid:
+                key = self._pending_key(order)
+                if key not in self._inflight:
+                    self._inflight.add(key)
+                    fresh.append((key, order))
+        self.synced_orders.add_pending(
+            (self._pending_key(order), json.dumps(order, ensure_ascii=False, default=str)) for order in valid)
+        
+        for number, (key, order) in enumerate(fresh):
+            start = time.perf_counter()
+            try:
+                self.write_queue.put(order, timeout=timeout)
+            except queue.Full:
+                with self._inflight_lock:
+                    self._inflight.difference_update(key for key, _ in fresh[number:])
+                self.logger.warning(f"写入队列已满，{len(fresh) - number} 条订单留在待写入列表中稍后重试")
+                break
+            finally:
+                with self._stats_lock:
+                    self.write_stats['blocked_seconds'] += time.perf_counter() - start
+        with self._stats_lock:
+            self.write_stats['enqueued'] += len(valid)
+        return len(valid)
+    
+    def _start_flushers(self):
+        with self._flusher_lock:
+            if self._flushers:
+                return
+            for i in range(max(1, self.flush_workers)):
+                thread = threading.Thread(target=self._flush_loop, name=f"firebase-flush-{i}", daemon=True)
+                thread.start()
+                self._flushers.append(thread)
+        # 上次运行留下的订单
+        self._retry_pending()
+    
+    def _flush_loop(self):
+        """写入线程：取出一个订单后再等待flush_linger秒收集更多订单，合并为一次批量写入
+
+        队列空闲或距上次重试超过 pending_retry_interval 秒时，把待写入列表中失败的订单重新放入队列
+        """
+        while True:
+            if time.monotonic() - self._last_retry >= self.pending_retry_interval:
+                self._retry_pending()
+            try:
+                order = self.write_queue.get(timeout=self.pending_retry_interval)
+            except queue.Empty:
+                continue
+            if order is None:
+                self.write_queue.task_done()
+                return
+            batch, stop = [order], False
+            deadline = time.monotonic() + self.flush_linger
+            while len(batch) < self.batch_size:
+                try:
+                    order = self.write_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if order is None:
+                    stop = True
+                    break
+                batch.append(order)
+            
+            try:
+                self._flush(batch)
+            finally:
+                for _ in batch:
+                    self.write_queue.task_done()
+                if stop:
+                    self.write_queue.task_done()
+            if stop:
+                return
+    
+    def _sync_batch(self, batch: List[Dict]) -> Dict:
+        try:
+            return self.sync_multiple_orders(batch)
+        except Exception as e:
+            self.logger.error(f"后台写入异常: {str(e)}")
+            return {'success': 0, 'failed': len(batch), 'errors': [str(e)], 'failed_orders': batch}
+    
+    def _flush(self, batch: List[Dict]):
+        start = time.perf_counter()
+        with self._inflight_lock:
+            isolated_keys = self._isolated.intersection(self._pending_key(order) for order in batch)
+        isolated = [order for order in batch if self._pending_key(order) in isolated_keys]
+        grouped = [order for order in batch if self._pending_key(order) not in isolated_keys]
+        results = self._sync_batch(grouped) if grouped else {'success': 0, 'failed': 0, 'failed_orders': []}
+        # 多次写入失败的订单逐条写入，单个被拒绝的订单不会拖累同批的其他订单
+        for order in isolated:
+            single = self._sync_batch([order])
+            results['success'] += single['success']
+            results['failed'] += single['failed']
+            if single.get('failed_orders'):
+                results['failed_orders'] = list(results.get('failed_orders', [])) + single['failed_orders']
+                error = single['errors'][-1] if single.get('errors') else '未知错误'
+                self.logger.error(f"❌ 订单 {self._pending_key(order)} 单独写入仍失败: {error}")
+        elapsed = time.perf_counter() - start
+        
+        with self._stats_lock:
+            self.write_stats['batches'] += 1
+            self.write_stats['flushed'] += results['success']
+            self.write_stats['failed'] += results['failed']
+            self.write_stats['flush_seconds'] += elapsed
+            self.write_stats['last_flush_seconds'] = elapsed
+        
+        # 写入成功（或已存在）的订单移出待写入列表；重试后仍失败的留在列表中，稍后由_retry_pending重新入队
+        keys = [self._pending_key(order) for order in batch]
+        failed = {self._pending_key(order) for order in results.get('failed_orders', [])}
+        self.synced_orders.remove_pending(key for key in keys if key not in failed)
+        if failed:
+            self.synced_orders.mark_pending_failed(failed)
+            self.logger.warning(f"⚠️ {len(failed)} 条订单写入失败，保留在待写入列表中，"
+                                f"{self.pending_retry_interval:.0f}秒后重试")
+        with self._inflight_lock:
+            self._inflight.difference_update(keys)
+            self._isolated.difference_update(key for key in keys if key not in failed)
+    
+    def _retry_pending(self):
+        """把待写入列表中不在队列里的订单（写入失败、队列满时未入队或上次运行遗留的）放回队列"""
+        self._last_retry = time.monotonic()
+        if self._closing:
+            return
+        space = self.write_queue.maxsize - self.write_queue.qsize() if self.write_queue.maxsize > 0 else self.batch_size
+        if space <= 0:
+            return
+        retried = 0
+        for key, payload, attempts in self.synced_orders.load_pending(space + len(self._inflight)):
+            with self._inflight_lock:
+                if key in self._inflight:
+                    continue
+                self._inflight.add(key)
+                if attempts >= self.pending_isolate_attempts > 0 and key not in self._isolated:
+                    self._isolated.add(key)
+                    self.logger.warning(f"⚠️ 订单 {key} 已连续写入失败 {attempts} 次，改为单独写入")
+            try:
+                self.write_queue.put_nowait(json.loads(payload))
+            except queue.Full:
+                with self._inflight_lock:
+                    self._inflight.discard(key)
+                break
+            retried += 1
+        if retried:
+            with self._stats_lock:
+                self.write_stats['retried'] += retried
+            self.logger.info(f"🔁 重新放入 {retried} 条待写入订单")
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中的订单全部写完，返回是否在超时前完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.write_queue.all_tasks_done:
+            while self.write_queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.write_queue.all_tasks_done.wait(remaining)
+        return True
+    
+    def get_write_stats(self) -> Dict:
+        """后台写入指标：队列深度、待写入列表长度、入队阻塞时间、批次数和写入耗时"""
+        with self._stats_lock:
+            stats = dict(self.write_stats)
+        stats['depth'] = self.write_queue.qsize()
+        stats['pending'] = self.synced_orders.count_pending()
+        stats['avg_flush_seconds'] = round(stats['flush_seconds'] / stats['batches'], 3) if stats['batches'] else 0.0
+        return stats
+    
     def get_recent_orders(self, limit: int = 50) -> List[Dict]:
         """获取最近的订单"""
         try:
@@ -223,66 +799,179 @@ class FirebaseSync:
             self.logger.error(f"获取最近订单失败: {str(e)}")
             return []
     
-    def cleanup_old_logs(self, days_to_keep: int = 30):
-        """清理旧的同步日志"""
+    def cleanup_old_logs(self, days_to_keep: Optional[int] = None, by: str = 'timestamp') -> int:
+        """分页清理旧的同步日志，返回删除数量
+
+        每次只查询 log_cleanup_batch_size 条早于保留期的日志，用一次多路径update（值为None）整页删除，
+        页与页之间按 log_cleanup_rate（每秒页数）限速，避免占满数据库带宽。
+        by='timestamp' 按日志的ISO时间字符串查询（需要在数据库规则中为 sync_logs 设置 .indexOn: timestamp），
+        数据库没有该索引时自动改为按key清理；
+        by='key' 按key查询，不需要索引：新格式 年月日_时分秒 key 直接比较，旧版本的push id按key中编码的时间比较。
+        """
+        days_to_keep = self.log_retention_days if days_to_keep is None else days_to_keep
+        cutoff = datetime.now() - timedelta(days=days_to_keep)
+        if by not in ('timestamp', 'key'):
+            raise ValueError(f"未知的日志清理方式: {by}")
+        
+        progress = self.cleanup_progress
+        progress.update(running=True, deleted=0, pages=0, cutoff=cutoff.isoformat(), error=None,
+                        started_at=datetime.now().isoformat(), finished_at=None)
         try:
-            cutoff_date = datetime.now().timestamp() - (days_to_keep * 24 * 3600)
-            
-            logs_ref = self.db_ref.child(self.sync_log_collection)
-            old_logs = logs_ref.order_by_child('timestamp').end_at(cutoff_date).get()
-            
-            if old_logs:
-                for log_id in old_logs.keys():
-                    logs_ref.child(log_id).delete()
-                
-                self.logger.info(f"清理了 {len(old_logs)} 条旧日志")
-            
+            if by == 'timestamp':
+                try:
+                    self._delete_log_pages(self.db_ref.child(self.sync_log_collection)
+                                           .order_by_child('timestamp').end_at(cutoff.isoformat()))
+                except Exception as e:
+                    if 'index' not in str(e).lower():
+                        raise
+                    self.logger.warning(f"⚠️ sync_logs 没有 timestamp 索引，改为按key清理: {str(e)}")
+                    by = 'key'
+            if by == 'key':
+                logs_ref = self.db_ref.child(self.sync_log_collection)
+                # push id以'-'开头，排在时间戳key之前；两种key分别按范围查询
+                self._delete_log_pages(logs_ref.order_by_key().start_at('-').end_at(push_id_prefix(cutoff)))
+                self._delete_log_pages(logs_ref.order_by_key().start_at('0').end_at(cutoff.strftime('%Y%m%d_%H%M%S')))
+            self.logger.info(f"清理了 {progress['deleted']} 条 {cutoff.strftime('%Y-%m-%d')} 之前的旧日志")
         except Exception as e:
+            progress['error'] = str(e)
             self.logger.error(f"清理旧日志失败: {str(e)}")
+        finally:
+            progress.update(running=False, finished_at=datetime.now().isoformat())
+        return progress['deleted']
+    
+    def _delete_log_pages(self, query):
+        """按页删除查询到的日志，直到查询结果为空或服务关闭"""
+        batch_size = max(1, self.log_cleanup_batch_size)
+        limiter = RateLimiter(self.log_cleanup_rate) if self.log_cleanup_rate > 0 else None
+        progress = self.cleanup_progress
+        while not self._closing:
+            if limiter:
+                limiter.acquire()
+            page = query.limit_to_first(batch_size).get()
+            if not page:
+                return
+            ok, error = self._write_batch({f"{self.sync_log_collection}/{key}": None for key in page})
+            if not ok:
+                raise RuntimeError(f"删除旧日志失败: {error}")
+            progress['deleted'] += len(page)
+            progress['pages'] += 1
+            self.logger.info(f"🧹 清理旧日志: 第{progress['pages']}页 {len(page)} 条，累计 {progress['deleted']} 条")
+            if len(page) < batch_size:
+                return
+    
+    def start_log_cleanup(self, days_to_keep: Optional[int] = None, by: str = 'timestamp') -> threading.Thread:
+        """在后台线程中清理旧日志，之后每隔 log_cleanup_interval 秒再清理一次（为0时只清理一次），直到close()
+
+        已在运行时直接返回该线程；进度见 get_cleanup_progress()
+        """
+        with self._cleanup_lock:
+            if self._cleanup_thread and self._cleanup_thread.is_alive():
+                return self._cleanup_thread
+            self._cleanup_thread = threading.Thread(target=self._log_cleanup_loop, args=(days_to_keep, by),
+                                                    name="firebase-log-cleanup", daemon=True)
+            self._cleanup_thread.start()
+            return self._cleanup_thread
+    
+    def _log_cleanup_loop(self, days_to_keep: Optional[int], by: str):
+        while not self._closing:
+            self.cleanup_old_logs(days_to_keep, by)
+            if self.log_cleanup_interval <= 0 or self._cleanup_stop.wait(self.log_cleanup_interval):
+                return
+    
+    def get_cleanup_progress(self) -> Dict:
+        """日志清理进度：是否在运行、已删除条数、页数、截止时间和错误"""
+        return dict(self.cleanup_progress)
     
     def get_sync_statistics(self) -> Dict:
-        """获取同步统计信息"""
+        """获取同步统计信息：只读取 sync_stats 中的计数器和今天的汇总节点"""
         try:
-            stats = {
-                'total_orders': 0,
-                'today_synced': 0,
-                'last_sync_time': None,
-                'error_count': 0
+            stats_ref = self.db_ref.child(self.stats_collection)
+            totals = stats_ref.child('totals').get() or {}
+            today = stats_ref.child('days').child(datetime.now().strftime('%Y-%m-%d')).get() or {}
+            return {
+                'total_orders': totals.get('orders', 0),
+                'total_amount': round(_to_amount(totals.get('amount')), 2),
+                'today_synced': today.get('orders', 0),
+                'today_amount': round(_to_amount(today.get('amount')), 2),
+                'last_sync_time': totals.get('last_sync_time'),
+                'error_count': totals.get('errors', 0)
             }
             
-            # 获取订单总数
-            orders_ref = self.db_ref.child(self.orders_collection)
-            orders = orders_ref.get()
-            if orders:
-                stats['total_orders'] = len(orders)
-            
-            # 获取今日同步数量
-            today = datetime.now().strftime('%Y-%m-%d')
-            today_orders = [
-                order for order in (orders.values() if orders else [])
-                if order.get('sync_time', '').startswith(today)
-            ]
-            stats['today_synced'] = len(today_orders)
-            
-            # 获取最后同步时间
-            if orders:
-                latest_order = max(
-                    orders.values(),
-                    key=lambda x: x.get('sync_time', ''),
-                    default={}
-                )
-                stats['last_sync_time'] = latest_order.get('sync_time')
-            
-            return stats
-            
         except Exception as e:
             self.logger.error(f"获取同步统计失败: {str(e)}")
             return {}
     
+    def rebuild_statistics(self) -> Dict:
+        """从 orders_auto 和 sync_logs 全量重新计算 sync_stats
+
+        计数器由每次写入增量维护，数据被手动修改或迁移后可能不准，用这个方法校正；
+        运行期间的增量写入可能被覆盖，建议在同步停止时执行。
+        """
+        totals = {'orders': 0, 'amount': 0.0, 'errors': 0, 'last_sync_time': None}
+        days = {}
+        
+        def day_node(day):
+            return days.setdefault(day, {'orders': 0, 'amount': 0.0, 'errors': 0})
+        
+        orders = self.db_ref.child('orders_auto').get() or {}
+        for _, order in self._iter_stored_orders(orders):
+            sync_time = str(order.get('sync_time') or '')
+            day = sync_time[:10] if DAY_KEY.match(sync_time[:10]) else order_day(order.get('createdAt'))
+            amount = _to_amount(order.get('amount'))
+            totals['orders'] += 1
+            totals['amount'] += amount
+            day_node(day)['orders'] += 1
+            day_node(day)['amount'] += amount
+            if sync_time and sync_time > (totals['last_sync_time'] or ''):
+                totals['last_sync_time'] = sync_time
+        
+        # 汇总日志带failed数量；旧版本按订单记录的日志以status为error计1次
+        logs = self.db_ref.child(self.sync_log_collection).get() or {}
+        for log in logs.values():
+            if not isinstance(log, dict):
+                continue
+            failed = log.get('failed') if isinstance(log.get('failed'), int) else int(log.get('status') == 'error')
+            if not failed:
+                continue
+            totals['errors'] += failed
+            day = str(log.get('timestamp') or '')[:10]
+            if DAY_KEY.match(day):
+                day_node(day)['errors'] += failed
+        
+        totals['amount'] = round(totals['amount'], 2)
+        for node in days.values():
+            node['amount'] = round(node['amount'], 2)
+        ok, error = self._write_batch({self.stats_collection: {
+            'totals': totals,
+            'days': days,
+            'rebuilt_at': datetime.now().isoformat(),
+        }})
+        if not ok:
+            raise RuntimeError(f"写入统计数据失败: {error}")
+        self.logger.info(f"已重建同步统计: {totals['orders']} 条订单，{len(days)} 天，错误 {totals['errors']} 次")
+        return dict(totals, days=len(days))
+    
     def close(self):
         """关闭Firebase连接"""
         try:
+            # 不再接收新订单，写完队列中已有的订单后停止写入线程；写入失败的订单留在待写入列表中，下次启动后重试
+            self._closing = True
+            if self._flushers:
+                self.flush()
+                for _ in self._flushers:
+                    self.write_queue.put(None)
+                for thread in self._flushers:
+                    thread.join()
+                self._flushers = []
+            pending = self.synced_orders.count_pending()
+            if pending:
+                self.logger.warning(f"⚠️ {pending} 条订单未能写入，已保存在 {self.dedupe_db}，下次启动后重试")
+            # 清理任务在两页之间检查关闭标记，最多等当前一页删完
+            self._cleanup_stop.set()
+            if self._cleanup_thread:
+                self._cleanup_thread.join()
             # Firebase Admin SDK会自动管理连接
+            self.synced_orders.close()
             self.logger.info("Firebase同步服务已关闭")
         except Exception as e:
             self.logger.error(f"关闭Firebase连接时出错: {str(e)}")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP客户端模块
+为所有上游请求提供统一的连接池、超时和带抖动的指数退避重试，
+参数读取 config.json 的 scraper 配置段，并按接口统计请求耗时
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from urllib.parse import urlparse
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import load_config_section
+
+DEFAULT_HTTP_CONFIG = {
+    'timeout': 30,
+    'connect_timeout': 10,
+    'retry_times': 3,
+    'retry_delay': 5,
+    'retry_max_delay': 60,
+    'pool_connections': 10,
+    'pool_maxsize': 10,
+}
+
+# 只有幂等请求在读超时或服务端错误时重试，登录等POST只在连接失败时重试
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+def backoff_delay(config: Dict, attempt: int) -> float:
+    """第attempt次重试前的等待秒数：指数增长、封顶，并加入随机抖动避免多个请求同时重试"""
+    base = float(config['retry_delay']) * (2 ** attempt)
+    return min(base, float(config['retry_max_delay'])) * random.uniform(0.5, 1.5)
+
+
+def load_http_config(config_file: str = 'config.json') -> Dict:
+    """读取scraper配置段中的HTTP参数"""
+    return load_config_section('scraper', DEFAULT_HTTP_CONFIG, config_file, known_only=True, name='HTTP')
+
+
+class LatencyStats:
+    """按接口（方法+路径）记录请求耗时"""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint: str, elapsed: float, ok: bool, retried: bool = False):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = {'count': 0, 'errors': 0, 'retries': 0, 'samples': deque(maxlen=self.window)}
+                self._endpoints[endpoint] = entry
+            entry['count'] += 1
+            entry['samples'].append(elapsed)
+            if not ok:
+                entry['errors'] += 1
+            if retried:
+                entry['retries'] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """返回各接口的次数、错误数、重试数以及最近样本的耗时分位（毫秒）"""
+        with self._lock:
+            items = [(endpoint, dict(entry, samples=sorted(entry['samples'])))
+                     for endpoint, entry in self._endpoints.items()]
+
+        stats = {}
+        for endpoint, entry in items:
+            samples = entry['samples']
+            if not samples:
+                continue
+            stats[endpoint] = {
+                'count': entry['count'],
+                'errors': entry['errors'],
+                'retries': entry['retries'],
+                'avg_ms': round(sum(samples) / len(samples) * 1000, 1),
+                'p50_ms': round(samples[len(samples) // 2] * 1000, 1),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+                'max_ms': round(samples[-1] * 1000, 1),
+            }
+        return stats
+
+
+# 进程内所有会话共用的耗时统计
+LATENCY_STATS = LatencyStats()
+
+
+def get_latency_stats() -> Dict[str, Dict]:
+    """导出各上游接口的耗时统计"""
+    return LATENCY_STATS.snapshot()
+
+
+class RateLimiter:
+    """令牌桶限速：平均每秒rate个请求，允许burst个突发"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """有足够令牌时立即取走并返回True，否则返回False"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0):
+        """阻塞直到取得令牌"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RetrySession(requests.Session):
+    """自动附加超时、失败重试并记录耗时的Session
+
+    调用方式与requests.Session完全相同，显式传入timeout时以调用方为准。
+    设置rate_limiter后，每次请求（包括重试）前都会先取令牌。
+    """
+
+    def __init__(self, config: Optional[Dict] = None, stats: LatencyStats = LATENCY_STATS,
+                 rate_limiter: Optional[RateLimiter] = None):
+        super().__init__()
+        self.logger = logging.getLogger(__name__)
+        self.http_config = dict(DEFAULT_HTTP_CONFIG, **(config or {}))
+        self.stats = stats
+        self.rate_limiter = rate_limiter
+
+        adapter = HTTPAdapter(
+            pool_connections=int(self.http_config['pool_connections']),
+            pool_maxsize=int(self.http_config['pool_maxsize'])
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', (self.http_config['connect_timeout'], self.http_config['timeout']))
+        method = method.upper()
+        endpoint = f"{method} {urlparse(url).path or '/'}"
+        retry_times = int(self.http_config['retry_times'])
+
+        for attempt in range(retry_times + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # ConnectTimeout也属于ConnectionError，请求尚未发出，任何方法都可以重试
+                retryable = method in IDEMPOTENT_METHODS or isinstance(e, requests.exceptions.ConnectTimeout)
+                self._record(endpoint, start, False, attempt)
+                if not retryable or attempt >= retry_times:
+                    raise
+                self._backoff(endpoint, attempt, e)
+                continue
+            except requests.exceptions.Timeout as e:
+                self._record(endpoint, start, False, attempt)
+                if method not in IDEMPOTENT_METHODS or attempt >= retry_times:
+                    raise
+                self._backoff(endpoint, attempt, e)
+                continue
+
+            ok = response.status_code < 500
+            self._record(endpoint, start, ok, attempt)
+            if (response.status_code in RETRY_STATUS_CODES and method in IDEMPOTENT_METHODS
+                    and attempt < retry_times):
+                response.close()
+                self._backoff(endpoint, attempt, f"HTTP {response.status_code}")
+                continue
+            return response
+
+    def _record(self, endpoint, start, ok, attempt):
+        self.stats.record(endpoint, time.perf_counter() - start, ok, retried=attempt > 0)
+
+    def _backoff(self, endpoint, attempt, reason):
+        """指数退避后重试"""
+        delay = backoff_delay(self.http_config, attempt)
+        self.logger.warning(f"{endpoint} 请求失败（{reason}），{delay:.1f}秒后第{attempt + 1}次重试")
+        time.sleep(delay)
+
+
+def create_session(config_file: str = 'config.json', **overrides) -> RetrySession:
+    """按配置创建带重试和超时的Session，overrides可覆盖个别参数（如pool_maxsize）"""
+    config = load_http_config(config_file)
+    config.update(overrides)
+    return RetrySession(config)
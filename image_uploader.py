@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片上传模块
+统一的图床上传实现：直接从文件或内存缓冲区流式发送multipart请求体，不做base64编码，
+复用带连接池、超时和耗时统计的Session，并记录上传吞吐量。
+utils.upload_to_imgur、utils.imgur_uploader.upload_image_to_imgur 和
+utils.screenshot.upload_screenshot 都委托给这里。
+"""
+
+import io
+import os
+import time
+import uuid
+import logging
+import mimetypes
+import threading
+from typing import BinaryIO, Dict, Optional, Union
+
+from http_client import create_session
+
+IMGUR_UPLOAD_URL = "https://api.imgur.com/3/image"
+CHUNK_SIZE = 64 * 1024
+
+
+class MultipartStream:
+    """按块产生的multipart/form-data请求体
+
+    只在内存中保存各部分的头和尾，文件内容在发送时按块读取；
+    提供 __len__ 让requests发送Content-Length，而不是分块传输编码。
+    """
+
+    def __init__(self, fields: Dict[str, str], file_field: str, filename: str,
+                 fileobj: BinaryIO, size: int, content_type: str):
+        self.boundary = uuid.uuid4().hex
+        head = io.BytesIO()
+        for name, value in fields.items():
+            head.write(f"--{self.boundary}\r\n"
+                       f"Content-Disposition: form-data; name=\"{name}\"\r\n\r\n"
+                       f"{value}\r\n".encode('utf-8'))
+        head.write(f"--{self.boundary}\r\n"
+                   f"Content-Disposition: form-data; name=\"{file_field}\"; filename=\"{filename}\"\r\n"
+                   f"Content-Type: {content_type}\r\n\r\n".encode('utf-8'))
+        tail = f"\r\n--{self.boundary}--\r\n".encode('utf-8')
+
+        self._parts = [io.BytesIO(head.getvalue()), fileobj, io.BytesIO(tail)]
+        self._starts = [part.tell() for part in self._parts]
+        self._length = len(head.getvalue()) + size + len(tail)
+        self._index = 0
+        self.bytes_sent = 0
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._index < len(self._parts):
+            chunk = self._parts[self._index].read(size)
+            if not chunk:
+                self._index += 1
+                continue
+            chunks.append(chunk)
+            size -= len(chunk)
+        data = b''.join(chunks)
+        self.bytes_sent += len(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def seek(self, offset: int, whence: int = 0):
+        """只支持回到开头，用于重新发送"""
+        if offset != 0 or whence != 0:
+            raise io.UnsupportedOperation("MultipartStream只支持seek(0)")
+        for part, start in zip(self._parts, self._starts):
+            part.seek(start)
+        self._index = 0
+        self.bytes_sent = 0
+        return 0
+
+    def tell(self) -> int:
+        return self.bytes_sent
+
+
+class ImageUploader:
+    """上传图片到Imgur或兼容的HTTP接口，响应JSON中的 data.link / link / url 作为图片链接"""
+
+    def __init__(self, endpoint: str = IMGUR_UPLOAD_URL, client_id: Optional[str] = None,
+                 field: str = 'image', session=None):
+        self.logger = logging.getLogger(__name__)
+        self.endpoint = endpoint
+        self.client_id = client_id
+        self.field = field
+        # 上传请求不由Session重试（请求体是流），失败后由调用方决定是否重试
+        self.session = session or create_session(retry_times=0)
+        self.uploads = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _headers(self) -> Dict[str, str]:
+        if self.endpoint != IMGUR_UPLOAD_URL:
+            return {}
+        client_id = self.client_id or os.getenv("IMGUR_CLIENT_ID")
+        if not client_id:
+            raise ValueError("IMGUR_CLIENT_ID is not set in environment variables")
+        return {"Authorization": f"Client-ID {client_id}"}
+
+    def upload(self, source: Union[str, bytes, BinaryIO], filename: Optional[str] = None,
+               title: Optional[str] = None) -> Optional[str]:
+        """上传文件路径、bytes或二进制文件对象，返回图片链接；HTTP错误时抛出requests异常"""
+        headers = self._headers()
+        if isinstance(source, str):
+            filename = filename or os.path.basename(source)
+            with open(source, 'rb') as f:
+                return self._send(f, os.fstat(f.fileno()).st_size, filename, title, headers)
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        start = source.tell()
+        size = source.seek(0, os.SEEK_END) - start
+        source.seek(start)
+        return self._send(source, size, filename or f"screenshot_{int(time.time())}.png", title, headers)
+
+    def _send(self, fileobj: BinaryIO, size: int, filename: str, title: Optional[str],
+              headers: Dict[str, str]) -> Optional[str]:
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        fields = {'type': 'file'}
+        if title:
+            fields['title'] = title
+        body = MultipartStream(fields, self.field, filename, fileobj, size, content_type)
+        headers = dict(headers, **{'Content-Type': body.content_type})
+
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.endpoint, data=body, headers=headers)
+            response.raise_for_status()
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.uploads += 1
+            self.bytes_sent += len(body)
+            self.seconds += elapsed
+        self.logger.info(f"📤 上传 {filename} {len(body) / 1024:.0f}KB，用时 {elapsed:.2f}秒"
+                         f"（{len(body) / 1024 / max(elapsed, 1e-6):.0f}KB/s）")
+
+        try:
+            data = response.json()
+        except ValueError:
+            return response.text.strip() or None
+        data = data.get('data', data) if isinstance(data, dict) else {}
+        return data.get('link') or data.get('url')
+
+    def __call__(self, path: str) -> Optional[str]:
+        return self.upload(path)
+
+    def get_stats(self) -> Dict:
+        """上传次数、失败次数、总字节数和平均吞吐量(KB/s)"""
+        with self._lock:
+            return {
+                'uploads': self.uploads,
+                'failures': self.failures,
+                'bytes_sent': self.bytes_sent,
+                'seconds': round(self.seconds, 3),
+                'throughput_kbps': round(self.bytes_sent / 1024 / self.seconds, 1) if self.seconds else 0.0,
+            }
+
+
+_default_uploader: Optional[ImageUploader] = None
+_default_lock = threading.Lock()
+
+
+def get_uploader() -> ImageUploader:
+    """进程内共享的Imgur上传器，所有调用复用同一个连接池"""
+    global _default_uploader
+    with _default_lock:
+        if _default_uploader is None:
+            _default_uploader = ImageUploader()
+        return _default_uploader
@@ -6,10 +6,85 @@ from dotenv import load_dotenv
 from order_scraper_requests import OrderScraperRequests
 from firebase_sync import FirebaseSync
 from product_matcher import ProductMatcher
+from adaptive_scheduler import AdaptiveScheduler
+from session_state import SessionExpiredError
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("main")
 
+
+class OrderSyncApp:
+    """run.py 使用的同步应用：抓取今日新订单、匹配商品、交给Firebase后台写入，再推进抓取游标"""
+
+    def __init__(self):
+        self.firebase = None
+        self.matcher = None
+        self.scraper = None
+        self.scheduler = None
+
+    def initialize_services(self) -> bool:
+        load_dotenv()
+        try:
+            self.firebase = FirebaseSync()
+            self.matcher = ProductMatcher()
+            self.scraper = OrderScraperRequests()
+            self.scheduler = AdaptiveScheduler.from_config(int(os.getenv("SYNC_INTERVAL", 10)))
+            if os.getenv("SYNC_ADAPTIVE", "1") == "0":
+                self.scheduler.enabled = False
+            return True
+        except Exception as e:
+            logger.error(f"❌ 服务初始化失败：{e}")
+            return False
+
+    def _fetch_today(self):
+        """抓取今日新订单，查询发现会话失效时重新登录后重试一次；登录失败返回None"""
+        if not self.scraper.ensure_session():
+            logger.error("❌ 登录失败，无法继续查询")
+            return None
+        today = time.strftime("%Y-%m-%d")
+        try:
+            return self.scraper.fetch_orders(today, today)
+        except SessionExpiredError:
+            logger.warning("⚠️ 查询时发现会话已失效，重新登录")
+            if not self.scraper.login():
+                logger.error("❌ 重新登录失败，无法继续查询")
+                return None
+            return self.scraper.fetch_orders(today, today)
+
+    def sync_orders(self) -> int:
+        """执行一轮同步，返回交给后台写入的新订单数"""
+        orders = self._fetch_today()
+        if orders is None:
+            return 0
+        for order in orders:
+            order['matched_products'] = self.matcher.match_products(order)
+        if orders:
+            self.firebase.enqueue_orders(orders)
+            logger.info(f"📦 抓取到 {len(orders)} 条新订单，已提交后台写入")
+        # 订单已持久入队才推进游标，入队失败（抛出异常）时下一轮重新抓取
+        self.scraper.commit_cursor()
+        return len(orders)
+
+    def run(self):
+        """按自适应调度循环同步，退出时写完队列中的订单"""
+        if self.firebase is None and not self.initialize_services():
+            return
+        self.firebase.start_log_cleanup()
+        try:
+            while True:
+                new_orders = 0
+                try:
+                    new_orders = self.sync_orders()
+                except Exception as e:
+                    logger.error(f"❌ 主循环异常：{e}")
+                self.scheduler.wait(new_orders)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.firebase is not None:
+            self.firebase.close()
+
 def run():
     """启动Web登录助手"""
     print("=== 通联支付Web登录助手 ===")
@@ -45,26 +120,8 @@ def run():
         logger.info(f"🕰️ 启动时间：{time.strftime('%Y-%m-%d %H:%M:%S')}")
         logger.info("🛠️ 初始化服务组件...")
 
-        load_dotenv()
-        firebase = FirebaseSync()
-        matcher = ProductMatcher()
-        scraper = OrderScraperRequests()
-
-        while True:
-            try:
-                logger.info(f"📅 当前日期：{time.strftime('%Y-%m-%d')}")
-                logger.info("🔍 正在抓取订单数据...")
-
-                html = scraper.query_orders()
-                if html and "金额" in html:
-                    logger.info("✅ 抓取成功，截图已上传")
-                else:
-                    logger.warning("⚠️ 未发现订单或页面异常，已截图上传")
-
-            except Exception as e:
-                logger.error(f"❌ 主循环异常：{e}")
-
-            time.sleep(int(os.getenv("SYNC_INTERVAL", 60)))
+        # 与run.py共用同一个同步循环：入队后推进游标，调度器只看到真正的新订单数
+        OrderSyncApp().run()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多商户抓取模块
+从 config.json 的 merchants 配置段加载多个通联商户账号，
+每个账号一个独立登录的抓取器（会话、游标、指纹互不影响），按账号限速并发抓取
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from adaptive_scheduler import AdaptiveScheduler
+from http_client import RateLimiter
+from order_scraper_requests import OrderScraperRequests
+from session_state import SessionExpiredError
+from utils.config import load_config_section
+
+
+def load_merchant_config(config_file: str = 'config.json') -> Dict:
+    """加载merchants配置段"""
+    return load_config_section('merchants', config_file=config_file, name='商户')
+
+
+class MerchantAccount:
+    """单个商户账号，账号密码和Cookie从带后缀的环境变量读取，不写进配置文件
+
+    例如 env_suffix 为 SHOP1 时读取 TONGLIAN_USERNAME_SHOP1、TONGLIAN_PASSWORD_SHOP1、
+    TONGLIAN_COOKIE_USERID_SHOP1、TONGLIAN_COOKIE_SESSION_SHOP1
+    """
+
+    def __init__(self, merchant_id: str, name: Optional[str] = None, env_suffix: Optional[str] = None,
+                 rate_limit: float = 2.0):
+        self.merchant_id = merchant_id
+        self.name = name or merchant_id
+        self.env_suffix = (env_suffix or merchant_id).upper()
+        self.rate_limit = rate_limit
+
+    def _env(self, key: str) -> Optional[str]:
+        return os.getenv(f"{key}_{self.env_suffix}")
+
+    @property
+    def username(self):
+        return self._env('TONGLIAN_USERNAME')
+
+    @property
+    def password(self):
+        return self._env('TONGLIAN_PASSWORD')
+
+    @property
+    def cookie_userid(self):
+        return self._env('TONGLIAN_COOKIE_USERID')
+
+    @property
+    def cookie_session(self):
+        return self._env('TONGLIAN_COOKIE_SESSION')
+
+    def create_scraper(self) -> OrderScraperRequests:
+        """创建该账号专用的抓取器，请求受账号自己的限速器约束"""
+        return OrderScraperRequests(
+            username=self.username,
+            password=self.password,
+            cookie_userid=self.cookie_userid,
+            cookie_session=self.cookie_session,
+            merchant_id=self.merchant_id,
+            rate_limiter=RateLimiter(self.rate_limit)
+        )
+
+
+class MerchantPool:
+    def __init__(self, config_file: str = 'config.json'):
+        self.logger = logging.getLogger(__name__)
+        config = load_merchant_config(config_file)
+        default_rate = float(config.get('rate_limit_per_second', 2))
+
+        self.accounts = [
+            MerchantAccount(
+                item['id'],
+                name=item.get('name'),
+                env_suffix=item.get('env_suffix'),
+                rate_limit=float(item.get('rate_limit_per_second', default_rate))
+            )
+            for item in config.get('accounts', [])
+            if item.get('id')
+        ]
+        self.scrapers = {account.merchant_id: account.create_scraper() for account in self.accounts}
+        self.max_workers = int(config.get('max_workers', 4))
+        self.logger.info(f"已加载 {len(self.accounts)} 个商户账号")
+
+    def _scrape_one(self, merchant_id: str) -> List[Dict]:
+        """抓取单个商户今日订单，会话失效时重新登录并重试一次"""
+        scraper = self.scrapers[merchant_id]
+        if not scraper.ensure_session():
+            self.logger.error(f"❌ 商户 {merchant_id} 登录失败")
+            return []
+
+        today = time.strftime("%Y-%m-%d")
+        try:
+            return scraper.fetch_orders(today, today)
+        except SessionExpiredError:
+            self.logger.warning(f"⚠️ 商户 {merchant_id} 会话已失效，重新登录")
+            if not scraper.login():
+                self.logger.error(f"❌ 商户 {merchant_id} 重新登录失败")
+                return []
+            try:
+                return scraper.fetch_orders(today, today)
+            except SessionExpiredError:
+                self.logger.error(f"❌ 商户 {merchant_id} 重新登录后会话仍然无效")
+                return []
+
+    def scrape_all(self) -> Dict[str, List[Dict]]:
+        """并发抓取所有商户，返回 {商户ID: 新订单列表}；单个商户出错不影响其他商户"""
+        results = {}
+        if not self.scrapers:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.scrapers))) as executor:
+            futures = {
+                merchant_id: executor.submit(self._scrape_one, merchant_id)
+                for merchant_id in self.scrapers
+            }
+            for merchant_id, future in futures.items():
+                try:
+                    results[merchant_id] = future.result()
+                except Exception as e:
+                    self.logger.error(f"❌ 商户 {merchant_id} 抓取异常：{e}")
+                    results[merchant_id] = []
+        return results
+
+    def sync_all(self, firebase, matcher) -> Dict[str, Dict]:
+        """抓取所有商户并放入Firebase后台写入队列，订单已带merchant_id标记"""
+        summary = {}
+        # 所有商户本轮的订单汇总到同一条同步日志
+        cycle = firebase.new_cycle()
+        for merchant_id, orders in self.scrape_all().items():
+            for order in orders:
+                order['matched_products'] = matcher.match_products(order)
+            try:
+                if orders:
+                    summary[merchant_id] = {'queued': firebase.enqueue_orders(orders, cycle=cycle)}
+                    self.logger.info(f"📦 商户 {merchant_id}：{len(orders)} 条新订单")
+            except Exception as e:
+                # 游标不推进，下一轮重新抓取这些订单
+                self.logger.error(f"❌ 商户 {merchant_id} 订单入队失败：{e}")
+                continue
+            self.scrapers[merchant_id].commit_cursor()
+        return summary
+
+
+def main():
+    from dotenv import load_dotenv
+    from firebase_sync import FirebaseSync
+    from product_matcher import ProductMatcher
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+
+    pool = MerchantPool()
+    firebase = FirebaseSync()
+    matcher = ProductMatcher()
+    scheduler = AdaptiveScheduler.from_config(int(os.getenv("SYNC_INTERVAL", 10)))
+    firebase.start_log_cleanup()
+
+    try:
+        while True:
+            new_orders = 0
+            try:
+                summary = pool.sync_all(firebase, matcher)
+                new_orders = sum(result.get('queued', 0) for result in summary.values())
+            except Exception as e:
+                logging.error(f"❌ 多商户主循环异常：{e}")
+            scheduler.wait(new_orders)
+    except KeyboardInterrupt:
+        print("🛑 已手动停止同步任务")
+    finally:
+        firebase.close()
+
+
+if __name__ == "__main__":
+    main()
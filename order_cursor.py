@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订单抓取游标模块
+持久化记录已抓取到的最新交易时间（高水位）及该时间点上的订单号，
+供增量抓取使用
+"""
+
+import os
+import json
+import logging
+from typing import Dict, List, Optional
+
+from utils.config import save_json_atomic
+
+
+class OrderCursor:
+    """增量抓取的高水位游标
+
+    只记录最后一次见到的交易时间 ``last_time`` 以及该时间点上的订单号集合。
+    同一秒内可能有多笔交易，因此下次查询从 ``last_time`` 开始（含），
+    再用订单号集合过滤掉边界上已见过的订单。
+    """
+
+    def __init__(self, path: str = 'order_cursor.json'):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.last_time: Optional[str] = None
+        self.ids_at_last_time: set = set()
+        self.load()
+
+    def load(self):
+        """从文件加载游标"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.last_time = data.get('last_time')
+            self.ids_at_last_time = set(data.get('ids_at_last_time', []))
+            self.logger.info(f"已加载抓取游标: {self.last_time} ({len(self.ids_at_last_time)} 个边界订单)")
+        except Exception as e:
+            self.logger.error(f"加载抓取游标失败: {str(e)}")
+            self.reset()
+
+    def save(self):
+        """保存游标到文件（先写临时文件再替换，避免写一半）"""
+        try:
+            save_json_atomic(self.path, {
+                'last_time': self.last_time,
+                'ids_at_last_time': sorted(self.ids_at_last_time)
+            })
+        except Exception as e:
+            self.logger.error(f"保存抓取游标失败: {str(e)}")
+
+    def reset(self):
+        """清空游标"""
+        self.last_time = None
+        self.ids_at_last_time = set()
+
+    def window_start(self, date: str) -> Optional[str]:
+        """返回指定日期的增量查询起点，游标不在该日期时返回None"""
+        if self.last_time and self.last_time.startswith(date):
+            return self.last_time
+        return None
+
+    def is_known(self, order: Dict) -> bool:
+        """判断订单是否已在游标之前（含边界上已见过的订单）"""
+        if not self.last_time:
+            return False
+        trans_time = order.get('create_time')
+        if not trans_time:
+            return False
+        if trans_time < self.last_time:
+            return True
+        return trans_time == self.last_time and order.get('order_id') in self.ids_at_last_time
+
+    def filter_new(self, orders: List[Dict]) -> List[Dict]:
+        """过滤出游标之后的新订单"""
+        return [order for order in orders if not self.is_known(order)]
+
+    def advance(self, orders: List[Dict]) -> bool:
+        """用新订单推进游标，返回游标是否发生变化"""
+        changed = False
+        for order in orders:
+            trans_time = order.get('create_time')
+            order_id = order.get('order_id')
+            if not trans_time or not order_id:
+                continue
+            if not self.last_time or trans_time > self.last_time:
+                self.last_time = trans_time
+                self.ids_at_last_time = {order_id}
+                changed = True
+            elif trans_time == self.last_time and order_id not in self.ids_at_last_time:
+                self.ids_at_last_time.add(order_id)
+                changed = True
+        return changed
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订单分页抓取模块
+先抓第一页读取总条数，再用有界线程池并发抓取剩余页，按页序合并并按订单号去重
+"""
+
+import re
+import math
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 页面中总条数的常见写法
+TOTAL_COUNT_PATTERNS = [
+    re.compile(r'共\s*(\d+)\s*条'),
+    re.compile(r'"(?:total|totalCount|totalNum|recordsTotal)"\s*:\s*"?(\d+)'),
+    re.compile(r'name=["\']?(?:total|totalCount)["\']?[^>]*value=["\']?(\d+)'),
+]
+
+
+def extract_total_count(text: str) -> Optional[int]:
+    """从查询结果中提取总条数，找不到时返回None"""
+    for pattern in TOTAL_COUNT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def dedupe_orders(orders: List[Dict]) -> List[Dict]:
+    """按订单号去重，保留首次出现的顺序"""
+    seen = set()
+    unique = []
+    for order in orders:
+        order_id = order.get('order_id')
+        if order_id:
+            if order_id in seen:
+                continue
+            seen.add(order_id)
+        unique.append(order)
+    return unique
+
+
+# fetch_page(page_num) 返回 (本页订单, 总条数)，失败时返回None
+PageFetcher = Callable[[int], Optional[Tuple[List[Dict], Optional[int]]]]
+
+
+class OrderPaginator:
+    def __init__(self, page_size: int = 50, max_workers: int = 4, max_pages: int = 50):
+        self.logger = logging.getLogger(__name__)
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+
+    def fetch_all(self, fetch_page: PageFetcher,
+                  stop_when: Optional[Callable[[List[Dict]], bool]] = None) -> Tuple[List[Dict], bool]:
+        """抓取全部分页
+
+        stop_when 对某一页返回True时，该页之后的数据被丢弃（第一页命中时不再抓取后续页）。
+        总条数已知时按第一页的实际条数计算页数（门户可能把每页条数限制在page_size以下）。
+        返回 (去重后的订单, 是否完整抓取)；任何一页失败、页数超过max_pages被截断或抓到的行数少于总条数都视为不完整。
+        """
+        first = fetch_page(1)
+        if first is None:
+            return [], False
+
+        first_orders, total = first
+        done = self._first_page_done(first_orders, total, stop_when)
+        if done is not None:
+            return dedupe_orders(first_orders), done
+
+        if total is None:
+            self.logger.warning("⚠️ 未能读取总条数，改为逐页抓取")
+            return self._fetch_sequential(fetch_page, first_orders, stop_when)
+
+        rows = len(first_orders)
+        page_count = self._page_count(total, rows)
+        if page_count <= 1:
+            return dedupe_orders(first_orders), self._covers_total({1: first_orders}, total, rows)
+
+        self.logger.info(f"📑 共 {total} 条，{page_count} 页，并发抓取剩余 {page_count - 1} 页")
+        pages = {1: first_orders}
+        complete = True
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, page_count - 1)) as executor:
+            futures = {
+                page_num: executor.submit(fetch_page, page_num)
+                for page_num in range(2, page_count + 1)
+            }
+            for page_num, future in futures.items():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.error(f"❌ 第{page_num}页抓取异常：{e}")
+                    result = None
+                if result is None:
+                    complete = False
+                    continue
+                pages[page_num] = result[0]
+
+        merged, stopped = self._merge(pages, stop_when)
+        return merged, complete and (stopped or self._covers_total(pages, total, rows))
+
+    async def fetch_all_async(self, fetch_page, stop_when=None) -> Tuple[List[Dict], bool]:
+        """fetch_all的asyncio版本，fetch_page为协程函数，剩余页用信号量限制并发"""
+        first = await fetch_page(1)
+        if first is None:
+            return [], False
+
+        first_orders, total = first
+        done = self._first_page_done(first_orders, total, stop_when)
+        if done is not None:
+            return dedupe_orders(first_orders), done
+
+        if total is None:
+            self.logger.warning("⚠️ 未能读取总条数，改为逐页抓取")
+            merged = list(first_orders)
+            for page_num in range(2, self.max_pages + 1):
+                result = await fetch_page(page_num)
+                if result is None:
+                    return dedupe_orders(merged), False
+                merged.extend(result[0])
+                if (stop_when and stop_when(result[0])) or len(result[0]) < self.page_size:
+                    break
+            else:
+                return dedupe_orders(merged), not self._truncated(None)
+            return dedupe_orders(merged), True
+
+        rows = len(first_orders)
+        page_count = self._page_count(total, rows)
+        if page_count <= 1:
+            return dedupe_orders(first_orders), self._covers_total({1: first_orders}, total, rows)
+
+        self.logger.info(f"📑 共 {total} 条，{page_count} 页，并发抓取剩余 {page_count - 1} 页")
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def bounded_fetch(page_num):
+            async with semaphore:
+                try:
+                    return await fetch_page(page_num)
+                except Exception as e:
+                    self.logger.error(f"❌ 第{page_num}页抓取异常：{e}")
+                    return None
+
+        results = await asyncio.gather(*(bounded_fetch(n) for n in range(2, page_count + 1)))
+        pages = {1: first_orders}
+        for page_num, result in enumerate(results, start=2):
+            if result is not None:
+                pages[page_num] = result[0]
+
+        merged, stopped = self._merge(pages, stop_when)
+        return merged, len(pages) == page_count and (stopped or self._covers_total(pages, total, rows))
+
+    def _first_page_done(self, first_orders: List[Dict], total: Optional[int], stop_when) -> Optional[bool]:
+        """只有第一页就能结束时返回是否完整，需要继续抓取时返回None
+
+        总条数已知时以总条数为准：门户把每页条数限制在page_size以下时，第一页不满一页也还有后续页。
+        """
+        if stop_when and stop_when(first_orders):
+            return True
+        if total is None:
+            return True if len(first_orders) < self.page_size else None
+        if total <= len(first_orders):
+            return True
+        if not first_orders:
+            self.logger.warning(f"⚠️ 共 {total} 条但第一页没有订单，结果不完整")
+            return False
+        if len(first_orders) < self.page_size:
+            self.logger.warning(f"⚠️ 每页只返回 {len(first_orders)} 条（配置 page_size={self.page_size}），"
+                                f"按实际条数计算页数")
+        return None
+
+    def _page_count(self, total: int, rows: Optional[int] = None) -> int:
+        rows = rows or self.page_size
+        return min(math.ceil(total / rows), self.max_pages)
+
+    def _covers_total(self, pages: Dict[int, List[Dict]], total: int, rows: int) -> bool:
+        """抓取的行数达到总条数（新订单使分页后移时会有重复行，去重前计数）才算完整"""
+        if self._truncated(total, rows):
+            return False
+        fetched = sum(len(page) for page in pages.values())
+        if fetched < total:
+            self.logger.warning(f"⚠️ 共 {total} 条，只抓到 {fetched} 条，结果不完整")
+            return False
+        return True
+
+    def _truncated(self, total: Optional[int], rows: Optional[int] = None) -> bool:
+        """页数超过max_pages时只抓了前max_pages页，记录警告并返回True（total为None表示逐页抓取未到末页）"""
+        rows = rows or self.page_size
+        if total is not None and math.ceil(total / rows) <= self.max_pages:
+            return False
+        fetched = self.max_pages * rows
+        count = f"共 {total} 条" if total is not None else f"超过 {fetched} 条"
+        self.logger.warning(f"⚠️ 订单{count}，超出 max_pages={self.max_pages} 页上限，"
+                            f"只抓取了前 {fetched} 条，结果不完整")
+        return True
+
+    def _merge(self, pages: Dict[int, List[Dict]], stop_when) -> Tuple[List[Dict], bool]:
+        """按页序合并，命中停止条件的页之后的数据丢弃；返回 (订单, 是否命中停止条件)"""
+        merged = []
+        for page_num in sorted(pages):
+            merged.extend(pages[page_num])
+            if stop_when and stop_when(pages[page_num]):
+                return dedupe_orders(merged), True
+        return dedupe_orders(merged), False
+
+    def _fetch_sequential(self, fetch_page: PageFetcher, first_orders: List[Dict],
+                          stop_when) -> Tuple[List[Dict], bool]:
+        """总条数未知时逐页抓取，直到出现不满一页或命中停止条件"""
+        merged = list(first_orders)
+        for page_num in range(2, self.max_pages + 1):
+            result = fetch_page(page_num)
+            if result is None:
+                return dedupe_orders(merged), False
+
+            page_orders = result[0]
+            merged.extend(page_orders)
+            if (stop_when and stop_when(page_orders)) or len(page_orders) < self.page_size:
+                break
+        else:
+            return dedupe_orders(merged), not self._truncated(None)
+
+        return dedupe_orders(merged), True
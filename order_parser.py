@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订单解析模块
+只提取查询结果表格的表头和数据行，可选用C实现的解析引擎（selectolax / lxml），
+未安装时回退到BeautifulSoup；另外负责把JSON查询接口的记录转换为订单字典
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# (表头, 数据行)，每行是单元格文本列表
+Table = Tuple[List[str], List[List[str]]]
+
+
+def _clean(text: Optional[str]) -> str:
+    """合并单元格内的空白"""
+    return ' '.join(text.split()) if text else ''
+
+
+class OrderTableParser:
+    """表格解析器基类"""
+    name = 'base'
+
+    def iter_tables(self, html: str) -> Iterator[Table]:
+        """依次返回页面中每个表格的表头和数据行"""
+        raise NotImplementedError
+
+
+class SelectolaxTableParser(OrderTableParser):
+    name = 'selectolax'
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        except ImportError:
+            from selectolax.parser import HTMLParser
+        self._parser_cls = HTMLParser
+
+    def iter_tables(self, html: str) -> Iterator[Table]:
+        tree = self._parser_cls(html)
+        for table in tree.css('table'):
+            headers = [_clean(th.text()) for th in table.css('thead th')]
+            rows = [
+                [_clean(td.text()) for td in tr.css('td')]
+                for tr in table.css('tbody tr')
+            ]
+            yield headers, rows
+
+
+class LxmlTableParser(OrderTableParser):
+    name = 'lxml'
+
+    def __init__(self):
+        import lxml.html
+        self._fromstring = lxml.html.fromstring
+
+    def iter_tables(self, html: str) -> Iterator[Table]:
+        if not html.strip():
+            return
+        tree = self._fromstring(html)
+        for table in tree.iter('table'):
+            headers = [_clean(th.text_content()) for th in table.xpath('./thead//th')]
+            rows = [
+                [_clean(td.text_content()) for td in tr.xpath('./td')]
+                for tr in table.xpath('./tbody/tr')
+            ]
+            yield headers, rows
+
+
+class SoupTableParser(OrderTableParser):
+    """BeautifulSoup回退实现，只构建<table>部分的文档树"""
+    name = 'bs4'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup, SoupStrainer
+        self._soup_cls = BeautifulSoup
+        self._only_tables = SoupStrainer('table')
+
+    def iter_tables(self, html: str) -> Iterator[Table]:
+        soup = self._soup_cls(html, 'html.parser', parse_only=self._only_tables)
+        for table in soup.find_all('table'):
+            headers = [_clean(th.get_text(' ')) for th in table.select('thead th')]
+            rows = [
+                [_clean(td.get_text(' ')) for td in tr.find_all('td')]
+                for tr in table.select('tbody tr')
+            ]
+            yield headers, rows
+
+
+PARSERS = {
+    'selectolax': SelectolaxTableParser,
+    'lxml': LxmlTableParser,
+    'bs4': SoupTableParser,
+}
+
+# auto模式下的优先顺序
+AUTO_ORDER = ['selectolax', 'lxml', 'bs4']
+
+
+def get_parser(name: str = 'auto') -> OrderTableParser:
+    """按名称创建解析器，auto时选择已安装的最快引擎"""
+    logger = logging.getLogger(__name__)
+    candidates = AUTO_ORDER if name in (None, '', 'auto') else [name] + AUTO_ORDER
+
+    for candidate in candidates:
+        parser_cls = PARSERS.get(candidate)
+        if parser_cls is None:
+            logger.warning(f"未知的HTML解析器: {candidate}")
+            continue
+        try:
+            parser = parser_cls()
+        except ImportError:
+            continue
+        logger.info(f"使用HTML解析器: {parser.name}")
+        return parser
+
+    raise ImportError("没有可用的HTML解析器，请安装 beautifulsoup4")
+
+
+# JSON记录字段名 -> 订单字段
+JSON_FIELD_ALIASES = {
+    'order_id': ('order_id', 'orderId', 'orderNo', 'cusorderid', 'reqsn', 'trxid'),
+    'create_time': ('create_time', 'transTime', 'tranxTime', 'trxTime', 'createTime', 'paytime'),
+    'amount': ('amount', 'transAmt', 'tranxAmt', 'trxamt'),
+    'payment_method': ('payment_method', 'payType', 'paytype', 'trxcode'),
+    'status': ('status', 'transStatus', 'trxstatus'),
+}
+
+# 记录列表常见的键名
+JSON_LIST_KEYS = ('list', 'rows', 'records', 'data', 'result')
+JSON_TOTAL_KEYS = ('total', 'totalCount', 'totalNum', 'recordsTotal')
+
+
+def find_json_records(payload: Any) -> Tuple[List[Dict], Optional[int]]:
+    """在JSON响应中查找记录列表和总条数"""
+    if isinstance(payload, list):
+        return payload, None
+    if not isinstance(payload, dict):
+        return [], None
+
+    total = next((payload[key] for key in JSON_TOTAL_KEYS if key in payload), None)
+    for key in JSON_LIST_KEYS:
+        value = payload.get(key)
+        if isinstance(value, list):
+            return value, int(total) if total is not None else None
+        if isinstance(value, dict):
+            records, nested_total = find_json_records(value)
+            if records:
+                return records, nested_total if nested_total is not None else total
+    return [], None
+
+
+def _normalize_time(value: Any) -> Optional[str]:
+    """统一为 YYYY-MM-DD HH:MM:SS，便于与抓取游标比较"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        seconds = value / 1000 if value > 1e11 else value
+        return datetime.fromtimestamp(seconds).strftime('%Y-%m-%d %H:%M:%S')
+    text = str(value).strip()
+    if text.isdigit() and len(text) == 14:
+        return datetime.strptime(text, '%Y%m%d%H%M%S').strftime('%Y-%m-%d %H:%M:%S')
+    return text
+
+
+def parse_json_orders(payload: Any) -> Tuple[List[Dict], Optional[int]]:
+    """把JSON查询接口的响应转换为 (订单列表, 总条数)"""
+    records, total = find_json_records(payload)
+    orders = []
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        order = {}
+        for field, aliases in JSON_FIELD_ALIASES.items():
+            for alias in aliases:
+                if record.get(alias) not in (None, ''):
+                    order[field] = record[alias]
+                    break
+        if not order.get('order_id'):
+            continue
+        try:
+            order['amount'] = float(str(order.get('amount', '')).replace(',', ''))
+        except ValueError:
+            continue
+        order['order_id'] = str(order['order_id'])
+        order['create_time'] = _normalize_time(order.get('create_time'))
+        order['source'] = '通联支付'
+        orders.append(order)
+    return orders, total
@@ -1,8 +1,13 @@
 import os
 import logging
 import time
-from playwright.async_api import async_playwright
-from utils.imgur_uploader import upload_image_to_imgur
+import asyncio
+from urllib.parse import urlparse
+from browser_manager import BrowserManager, load_browser_config
+from order_parser import parse_json_orders
+from screenshot_pipeline import ScreenshotPipeline
+from screenshot_store import ScreenshotStore
+from screenshot_uploader import ScreenshotUploadQueue
 
 class OrderScraper:
     def __init__(self):
@@ -10,7 +15,20 @@ class OrderScraper:
         self.session = os.getenv("TONGLIAN_COOKIE_SESSION")
         self.orders_url = "https://cus.allinpay.com/tranx/search"
         self.screenshot_dir = "screenshots"
-        os.makedirs(self.screenshot_dir, exist_ok=True)
+        # 与上一张同类截图几乎相同的不保存也不上传，保留的截图压缩为WebP/JPEG
+        self.screenshots = ScreenshotPipeline.from_config(self.screenshot_dir)
+        # 截图索引：按总大小和保留天数清理旧截图，可按抓取轮次查找
+        self.store = ScreenshotStore.from_config(self.screenshot_dir)
+        self.cycle_id = None
+        # 截图写到本地后交给后台线程上传，抓取流程不等待图床
+        self.uploads = ScreenshotUploadQueue.from_config()
+        # 浏览器和已登录页面在多次查询之间复用，回收或重启后重新调用login_with_cookie
+        browser_config = load_browser_config()
+        self.browser = BrowserManager(self.login_with_cookie, browser_config)
+        # 点击查询后等待的交易查询响应（XHR或表单提交），拿到即返回，不再固定等待
+        self.query_path = browser_config.get('query_path') or urlparse(self.orders_url).path
+        self.query_timeout = int(browser_config.get('query_timeout_ms', 15000))
+        self.last_orders = None
 
     async def login_with_cookie(self, context):
         page = await context.new_page()
@@ -25,47 +43,109 @@ class OrderScraper:
         await page.wait_for_load_state("networkidle")
 
         # 登录成功截图
-        login_path = os.path.join(self.screenshot_dir, f"screenshot_login_{int(time.time())}.png")
-        await page.screenshot(path=login_path)
-        login_imgur = upload_image_to_imgur(login_path)
-        print("✅ 登录成功截图：", login_imgur)
+        login_path = await self._capture(page, '登录', 'screenshot_login')
+        if login_path:
+            print("✅ 登录成功截图：", login_path)
         return page
 
+    async def _capture(self, page, kind, prefix):
+        """截图经去重压缩后保存并加入上传队列，与上一张同类截图相同时返回None"""
+        png_bytes = await page.screenshot()
+        path = await asyncio.to_thread(self.screenshots.save, png_bytes, kind, prefix)
+        if path:
+            self.store.add(path, kind, self.cycle_id)
+            self.uploads.submit(path, kind)
+        return path
+
     async def query_orders(self):
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                executable_path="/usr/bin/chromium"
-            )
-            context = await browser.new_context()
+        page = None
+        # 本轮截图都登记在这个轮次下，排查时用 self.store.find_cycle(轮次) 查找
+        self.cycle_id = time.strftime("%Y%m%d-%H%M%S")
+        print("🔄 抓取轮次：", self.cycle_id)
+        try:
+            page = await self.browser.get_page()
+            # 上一轮之后页面可能停在其他地址，回到订单查询页
+            if not page.url.startswith(self.orders_url):
+                await page.goto(self.orders_url)
+                await page.wait_for_load_state("networkidle")
+
+            await page.fill('input[name="startDate"]', time.strftime("%Y-%m-%d"))
+            await page.fill('input[name="endDate"]', time.strftime("%Y-%m-%d"))
+            content = await self._submit_query(page)
+
+            if self.last_orders or "交易时间" in content or "金额" in content:
+                order_path = await self._capture(page, '抓单', 'screenshot_orders')
+                if order_path:
+                    print("📦 抓单成功截图：", order_path)
+
+            return content
 
+        except Exception as e:
+            print("❌ 查询出错：", str(e))
             try:
-                page = await self.login_with_cookie(context)
+                error_path = await self._capture(page, '报错', 'screenshot_error')
+                if error_path:
+                    print("⚠️ 报错截图：", error_path)
+            except:
+                print("⚠️ 报错但截图失败")
+            # 页面状态未知，下一轮重启浏览器重新登录
+            self.browser.mark_broken()
+            return None
 
-                await page.fill('input[name="startDate"]', time.strftime("%Y-%m-%d"))
-                await page.fill('input[name="endDate"]', time.strftime("%Y-%m-%d"))
+    def _is_query_response(self, response):
+        return (urlparse(response.url).path.startswith(self.query_path)
+                and response.request.resource_type in ('xhr', 'fetch', 'document'))
+
+    async def _submit_query(self, page):
+        """点击查询并直接截获交易查询响应；JSON响应解析为订单列表存入last_orders"""
+        self.last_orders = None
+        try:
+            async with page.expect_response(self._is_query_response, timeout=self.query_timeout) as response_info:
                 await page.click('button:has-text("查询")')
-                await page.wait_for_timeout(2000)
-
-                content = await page.content()
-
-                if "交易时间" in content or "金额" in content:
-                    order_path = os.path.join(self.screenshot_dir, f"screenshot_orders_{int(time.time())}.png")
-                    await page.screenshot(path=order_path)
-                    order_imgur = upload_image_to_imgur(order_path)
-                    print("📦 抓单成功截图：", order_imgur)
-
-                await browser.close()
-                return content
-
-            except Exception as e:
-                print("❌ 查询出错：", str(e))
-                try:
-                    error_path = os.path.join(self.screenshot_dir, f"screenshot_error_{int(time.time())}.png")
-                    await page.screenshot(path=error_path)
-                    error_imgur = upload_image_to_imgur(error_path)
-                    print("⚠️ 报错截图：", error_imgur)
-                except:
-                    print("⚠️ 报错但截图失败")
-                await browser.close()
-                return None
\ No newline at end of file
+            response = await response_info.value
+        except Exception as e:
+            # 没有等到查询响应时退回读取渲染后的页面
+            print("⚠️ 未截获查询响应，读取页面内容：", str(e))
+            return await page.content()
+
+        content = await response.text()
+        if 'json' in response.headers.get('content-type', '').lower():
+            try:
+                self.last_orders, _ = parse_json_orders(await response.json())
+                print(f"⚡ 查询接口返回 {len(self.last_orders)} 条订单 ({len(content)} 字节)")
+            except ValueError as e:
+                print("⚠️ 查询响应JSON解析失败：", str(e))
+        return content
+
+    async def close(self):
+        await self.browser.close()
+        await asyncio.to_thread(self.uploads.close)
+
+
+def run_scraper(once: bool = False):
+    """循环抓取（once为True时只抓一轮），整个过程复用同一个浏览器；每轮间隔由AdaptiveScheduler按订单到达速率决定"""
+    from dotenv import load_dotenv
+    from adaptive_scheduler import AdaptiveScheduler
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    scheduler = AdaptiveScheduler.from_config(int(os.getenv("SYNC_INTERVAL", 10)))
+    if os.getenv("SYNC_ADAPTIVE", "1") == "0":
+        scheduler.enabled = False
+
+    async def _run():
+        scraper = OrderScraper()
+        try:
+            while True:
+                await scraper.query_orders()
+                if once:
+                    break
+                scheduler.record(len(scraper.last_orders or []))
+                await asyncio.sleep(scheduler.next_interval())
+        finally:
+            await scraper.close()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        print("🛑 已手动停止同步任务")
\ No newline at end of file
@@ -1,12 +1,16 @@
-import requests
-from bs4 import BeautifulSoup
+from http_client import create_session
 import datetime
 import logging
+from order_paginator import OrderPaginator, extract_total_count
+from order_parser import get_parser
 
 class OrderScraper:
-    def __init__(self, login_url, username=None, password=None, cookie_userid=None, cookie_session=None):
+    def __init__(self, login_url, username=None, password=None, cookie_userid=None, cookie_session=None,
+                 page_size=50, page_workers=4):
         self.logger = logging.getLogger("order_scraper")
-        self.session = requests.Session()
+        self.session = create_session(pool_maxsize=max(10, page_workers))
+        self.paginator = OrderPaginator(page_size, page_workers)
+        self.parser = get_parser()
         self.login_url = login_url
         self.logged_in = False
 
@@ -45,31 +49,43 @@ class OrderScraper:
                 "transTimeEnd": end_time,
                 "tranxType": "",
                 "queryType": "0",
-                "pageSize": "10",
+                "pageSize": str(self.paginator.page_size),
                 "pageNum": "1"
             }
 
-            response = self.session.post(url, data=data)
-            if response.status_code != 200:
-                self.logger.warning(f"订单查询失败，状态码: {response.status_code}")
-                return []
+            def fetch_page(page_num):
+                response = self.session.post(url, data=dict(data, pageNum=str(page_num)))
+                if response.status_code != 200:
+                    self.logger.warning(f"订单查询第{page_num}页失败，状态码: {response.status_code}")
+                    return None
+                return self.parse_rows(response.text), extract_total_count(response.text)
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            rows = soup.select("table tbody tr")
+            orders, complete = self.paginator.fetch_all(fetch_page)
+            if not complete:
+                self.logger.warning("部分分页抓取失败，订单可能不完整")
+            return orders
+        except Exception as e:
+            self.logger.error(f"订单抓取失败: {e}")
+            return []
 
-            orders = []
-            for row in rows:
-                cols = row.find_all("td")
-                if len(cols) >= 5:
-                    amount_text = cols[4].text.strip().replace("￥", "").replace(",", "")
-                    try:
-                        amount = float(amount_text)
-                    except:
-                        amount = 0
+    def parse_rows(self, html):
+        """解析结果表格中的订单行"""
+        orders = []
+        for _, rows in self.parser.iter_tables(html):
+            for cols in rows:
+                if len(cols) < 5:
+                    continue
+                amount_text = cols[4].replace("￥", "").replace(",", "")
+                try:
+                    amount = float(amount_text)
+                except:
+                    amount = 0
 
-                    order = {
-                        "order_id": cols[0].text.strip(),
-                        "amount": amount,
-                        "createdAt": cols[2].text.strip(),
-                        "source": "通联支付"
-                    }
\ No newline at end of file
+                order = {
+                    "order_id": cols[0],
+                    "amount": amount,
+                    "createdAt": cols[2],
+                    "source": "通联支付"
+                }
+                orders.append(order)
+        return orders
@@ -1,22 +1,101 @@
 import os
 import logging
 import time
-import requests
+from http_client import create_session
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 import json
+import re
+from order_cursor import OrderCursor
+from order_paginator import OrderPaginator, extract_total_count
+from order_parser import get_parser, find_json_records, parse_json_orders
+from response_fingerprint import ResponseFingerprints, html_digest, json_digest
+from session_state import SessionState, SessionExpiredError, is_login_response
+
+# 订单表格列名 -> 订单字段
+COLUMN_ALIASES = {
+    'order_id': ('商户订单号', '订单号', '交易流水号', '流水号'),
+    'create_time': ('交易时间',),
+    'amount': ('交易金额', '金额'),
+    'payment_method': ('支付方式', '交易方式'),
+    'status': ('交易状态', '状态'),
+}
+
+# 以XHR方式请求JSON查询接口时附加的请求头
+XHR_HEADERS = {
+    'X-Requested-With': 'XMLHttpRequest',
+    'Accept': 'application/json, text/javascript, */*; q=0.01'
+}
+
+# 没有表头时使用的默认列位置
+DEFAULT_COLUMNS = {
+    'order_id': 0,
+    'create_time': 2,
+    'amount': 4,
+}
 
 class OrderScraperRequests:
-    def __init__(self):
-        self.username = os.getenv("TONGLIAN_USERNAME")
-        self.password = os.getenv("TONGLIAN_PASSWORD")
+    def __init__(self, username=None, password=None, cookie_userid=None, cookie_session=None,
+                 merchant_id=None, rate_limiter=None):
+        """单商户时未传入的账号信息从环境变量读取；
+        多商户时每个账号一个实例（指定merchant_id），只使用传入的账号信息，会话、游标和指纹互相隔离
+        """
+        self.merchant_id = merchant_id
+        self.username = username or (None if merchant_id else os.getenv("TONGLIAN_USERNAME"))
+        self.password = password or (None if merchant_id else os.getenv("TONGLIAN_PASSWORD"))
+        self.cookie_userid = cookie_userid
+        self.cookie_session = cookie_session
         self.base_url = "https://cus.allinpay.com"
         self.login_url = "https://cus.allinpay.com/login"
         self.orders_url = "https://cus.allinpay.com/tranx/search"
-        self.session = requests.Session()
+        self._load_config()
+        # 并发翻页共享同一个已登录的Session，连接池需容纳所有并发请求
+        self.session = create_session(pool_maxsize=max(10, self.page_workers))
+        self.session.rate_limiter = rate_limiter
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        if merchant_id:
+            root, ext = os.path.splitext(self.cursor_file)
+            self.cursor_file = f"{root}_{merchant_id}{ext}"
+        self.cursor = OrderCursor(self.cursor_file)
+        self.paginator = OrderPaginator(self.page_size, self.page_workers, self.max_pages)
+        self.parser = get_parser(self.html_parser)
+        # JSON查询接口是否可用：None表示尚未探测
+        self.json_available = None if self.json_fast_path else False
+        self.fingerprints = ResponseFingerprints()
+        self.session_state = SessionState(self.session_idle_ttl)
+        self.cookies_applied = False
+        self.last_order_count = 0
+        # 最近一次抓取完成、等待订单写入后才记录的游标和指纹，见 commit_cursor()
+        self.pending_commit = None
+    
+    def _load_config(self):
+        """加载抓取配置"""
+        try:
+            with open('config.json', 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            
+            scraper_config = config.get('scraper', {})
+            self.page_size = int(scraper_config.get('page_size', 50))
+            self.max_pages = int(scraper_config.get('max_pages', 50))
+            self.page_workers = int(scraper_config.get('page_workers', 4))
+            self.html_parser = scraper_config.get('html_parser', 'auto')
+            self.json_fast_path = bool(scraper_config.get('json_fast_path', True))
+            self.json_query_url = scraper_config.get('json_query_url') or self.orders_url
+            self.cursor_file = scraper_config.get('cursor_file', 'order_cursor.json')
+            self.session_idle_ttl = float(scraper_config.get('session_idle_ttl', 600))
+            
+        except Exception as e:
+            logging.error(f"加载抓取配置失败: {str(e)}")
+            self.page_size = 50
+            self.max_pages = 50
+            self.page_workers = 4
+            self.html_parser = 'auto'
+            self.json_fast_path = True
+            self.json_query_url = self.orders_url
+            self.cursor_file = 'order_cursor.json'
+            self.session_idle_ttl = 600.0
         
     def login(self):
         """使用用户名密码登录"""
@@ -68,6 +147,7 @@ class OrderScraperRequests:
                 'tranx/search' in response_text or 
                 '退出登录' in response_text):
                 logging.info("✅ 用户名密码登录成功")
+                self.session_state.mark_valid()
                 return True
             elif '验证码' in response_text or 'captcha' in response_text.lower():
                 logging.error("❌ 登录需要验证码，请手动处理")
@@ -81,88 +161,294 @@ class OrderScraperRequests:
             logging.error(f"❌ 登录异常：{e}")
             return False
     
+    def _apply_env_cookies(self):
+        """把账号Cookie（未指定时取环境变量）设置到Session，Cookie为空时返回False"""
+        userid, session_id = self.cookie_userid, self.cookie_session
+        if not self.merchant_id:
+            userid = userid or os.getenv("TONGLIAN_COOKIE_USERID")
+            session_id = session_id or os.getenv("TONGLIAN_COOKIE_SESSION")
+        
+        # Cookie为空或为空字符串时无法使用
+        if not userid or not session_id or userid.strip() == '' or session_id.strip() == '':
+            return False
+        
+        self.session.cookies.set('userid', userid, domain='cus.allinpay.com')
+        self.session.cookies.set('SESSION', session_id, domain='cus.allinpay.com')
+        self.cookies_applied = True
+        return True
+    
     def login_with_cookie(self):
         """使用环境变量中的Cookie登录"""
+        # 设置Cookie，Cookie为空时直接使用用户名密码登录
+        if not self._apply_env_cookies():
+            logging.warning("⚠️ Cookie环境变量为空，直接使用用户名密码登录")
+            return self.login()
+        return self.probe_session()
+    
+    def probe_session(self):
+        """用Session中现有的Cookie请求订单页，判断登录状态，失效时改用用户名密码登录
+
+        不重新设置Cookie，避免用环境变量覆盖密码登录后拿到的新SESSION。
+        """
         try:
-            userid = os.getenv("TONGLIAN_COOKIE_USERID")
-            session_id = os.getenv("TONGLIAN_COOKIE_SESSION")
-            
-            # Cookie为空时直接使用用户名密码登录
-            if not userid or not session_id:
-                logging.warning("⚠️ Cookie环境变量为空，直接使用用户名密码登录")
-                return self.login()
-            
-            # 如果Cookie存在但为空字符串，也使用用户名密码登录
-            if userid.strip() == '' or session_id.strip() == '':
-                logging.warning("⚠️ Cookie值为空，直接使用用户名密码登录")
-                return self.login()
-            
-            # 设置Cookie
-            self.session.cookies.set('userid', userid, domain='cus.allinpay.com')
-            self.session.cookies.set('SESSION', session_id, domain='cus.allinpay.com')
-            
-            # 测试Cookie是否有效
+            self.session_state.probe_count += 1
             test_response = self.session.get(self.orders_url)
             response_text = test_response.text
             
             # 详细检查页面内容
-            has_login_elements = ('商户登录' in response_text or 
-                                '账号登录' in response_text or 
-                                'loginName' in response_text)
+            has_login_elements = is_login_response(test_response)
             has_order_elements = '交易查询' in response_text
             
             logging.info(f"Cookie测试结果: 登录元素={has_login_elements}, 订单元素={has_order_elements}")
             
             if has_login_elements:
                 logging.warning("⚠️ Cookie已失效，检测到登录页面，使用用户名密码登录")
+                self.session_state.mark_invalid("检测到登录页面")
                 return self.login()
             elif has_order_elements:
                 logging.info("✅ Cookie登录成功，已进入订单查询页面")
+                self.session_state.mark_valid()
                 return True
             else:
                 logging.warning("⚠️ 页面状态未知，使用用户名密码登录")
+                self.session_state.mark_invalid("页面状态未知")
                 return self.login()
                 
         except Exception as e:
             logging.error(f"❌ Cookie登录异常：{e}")
             return self.login()
     
-    def fetch_orders(self, start_date=None, end_date=None):
-        """抓取订单数据"""
+    def ensure_session(self):
+        """确保有可用的会话
+
+        会话在空闲TTL内视为有效，不发送任何请求；空闲超时后用当前Cookie探测一次。
+        首次使用时只设置Cookie，由真实查询的响应来判断是否有效。
+        """
+        if self.session_state.is_fresh():
+            return True
+        if self.session_state.needs_probe():
+            logging.info("🔎 会话空闲超时，探测登录状态")
+            return self.probe_session()
+        if not self.cookies_applied and not self._apply_env_cookies():
+            logging.warning("⚠️ Cookie环境变量为空，直接使用用户名密码登录")
+            return self.login()
+        return True
+    
+    def fetch_orders(self, start_date=None, end_date=None, incremental=True):
+        """抓取订单数据
+
+        单日查询且开启增量时，只请求游标之后的时间窗口，
+        翻页遇到已见过的订单即停止；订单写入（或持久入队）后调用 commit_cursor() 推进游标。
+        """
         try:
-            if not start_date:
-                start_date = time.strftime("%Y-%m-%d")
-            if not end_date:
-                end_date = start_date
-            
-            # 构建查询参数
-            params = {
-                'startDate': start_date,
-                'endDate': end_date,
-                'pageNum': 1,
-                'pageSize': 100
-            }
-            
-            # 发送查询请求
-            response = self.session.get(self.orders_url, params=params)
-            
-            if response.status_code == 200:
-                logging.info(f"✅ 成功获取订单页面 ({len(response.text)} 字符)")
-                return self.parse_orders(response.text)
-            else:
-                logging.error(f"❌ 获取订单失败：HTTP {response.status_code}")
-                return []
+            query = self.build_query(start_date, end_date, incremental)
+            orders, _ = self.run_query(query)
+            return orders
                 
+        except SessionExpiredError:
+            raise
         except Exception as e:
             logging.error(f"❌ 抓取订单异常：{e}")
             return []
     
+    def run_query(self, query):
+        """按build_query构建的查询翻页抓取，返回 (订单列表, 是否完整抓取)"""
+        def fetch_page(page_num):
+            return self._fetch_page(*self.page_request(query, page_num))
+        
+        orders, complete = self.paginator.fetch_all(fetch_page, self.stop_condition(query))
+        return self.finish_query(query, orders, complete), complete
+    
+    def build_query(self, start_date=None, end_date=None, incremental=True, time_begin=None, time_end=None):
+        """构建一次查询的参数、时间窗口和指纹记录
+
+        time_begin/time_end 指定精确的交易时间范围（补抓按小时切分时使用），此时不走增量游标
+        """
+        if not start_date:
+            start_date = time.strftime("%Y-%m-%d")
+        if not end_date:
+            end_date = start_date
+        # 上一次抓取未提交的结果作废，本次从游标重新抓取
+        self.pending_commit = None
+        
+        window_start = None
+        if time_begin or time_end:
+            incremental = False
+        elif incremental and start_date == end_date:
+            window_start = self.cursor.window_start(start_date)
+        else:
+            incremental = False
+        
+        # 构建查询参数
+        params = {
+            'startDate': start_date,
+            'endDate': end_date,
+            'transTimeBegin': time_begin or window_start or f"{start_date} 00:00:00",
+            'transTimeEnd': time_end or f"{end_date} 23:59:59",
+            'pageNum': 1,
+            'pageSize': self.page_size
+        }
+        if window_start:
+            logging.info(f"⏩ 增量抓取：从 {window_start} 开始")
+        
+        # 第一页的响应指纹与上次相同则说明没有新订单，跳过解析和同步
+        window = f"{params['transTimeBegin']}~{params['transTimeEnd']}"
+        return {
+            'params': params,
+            'window': window,
+            'incremental': incremental,
+            'fingerprint': {'window': window}
+        }
+    
+    def page_request(self, query, page_num):
+        """返回某一页的 (查询参数, 指纹记录)，只有第一页计算指纹"""
+        page_params = dict(query['params'], pageNum=page_num)
+        return page_params, query['fingerprint'] if page_num == 1 else None
+    
+    def stop_condition(self, query):
+        """增量模式下某页出现已抓取订单即停止翻页"""
+        if not query['incremental']:
+            return None
+        return lambda page: len(self.cursor.filter_new(page)) < len(page)
+    
+    def finish_query(self, query, orders, complete):
+        """过滤已抓取订单；完整抓取时记下待提交的游标和指纹，由 commit_cursor() 在写入后生效"""
+        fingerprint = query['fingerprint']
+        if fingerprint.get('unchanged'):
+            return []
+        if query['incremental']:
+            orders = self.cursor.filter_new(orders)
+        if self.merchant_id:
+            for order in orders:
+                order['merchant_id'] = self.merchant_id
+        
+        # 有分页失败时不记录指纹、不推进游标，下次重新抓取该窗口
+        if complete:
+            self.pending_commit = {'query': query, 'orders': list(orders)}
+        else:
+            self.fingerprints.forget(query['window'])
+            logging.warning("⚠️ 部分分页抓取不完整，本次不推进抓取游标")
+        
+        return orders
+    
+    def commit_cursor(self):
+        """订单已写入Firebase或已持久入队后调用：记录指纹并推进、保存游标
+
+        写入失败时不要调用，下次抓取会从原来的游标重新取回这些订单
+        """
+        pending, self.pending_commit = self.pending_commit, None
+        if not pending:
+            return
+        query = pending['query']
+        self.fingerprints.remember(query['window'], query['fingerprint'].get('digest'))
+        if query['incremental'] and self.cursor.advance(pending['orders']):
+            self.cursor.save()
+    
+    def _fetch_page(self, params, fingerprint=None):
+        """抓取一页订单，返回 (订单列表, 总条数)，失败时返回None
+
+        优先以XHR方式请求JSON查询接口；响应不是JSON时记住接口不可用，
+        直接解析已收到的HTML，此后只走HTML查询。
+        传入fingerprint时计算响应摘要，与上次相同则不解析，返回空结果。
+        """
+        if self.json_available is not False:
+            response = self.session.get(self.json_query_url, params=params, headers=XHR_HEADERS)
+            handled, result = self.handle_json_response(response, params, fingerprint)
+            if handled:
+                return result
+        
+        response = self.session.get(self.orders_url, params=params)
+        self.check_session(response)
+        return self.parse_html_page(response, params.get('pageNum'), fingerprint)
+    
+    def handle_json_response(self, response, params, fingerprint=None):
+        """处理JSON查询接口的响应，返回 (是否已处理, 结果)；未处理时调用方需改走HTML查询"""
+        page_num = params.get('pageNum')
+        self.check_session(response)
+        is_json = 'json' in response.headers.get('Content-Type', '').lower()
+        
+        if response.status_code == 200 and is_json:
+            try:
+                payload = response.json()
+                if fingerprint is not None and self._is_unchanged(fingerprint, json_digest(find_json_records(payload))):
+                    return True, ([], 0)
+                result = parse_json_orders(payload)
+            except ValueError as e:
+                logging.warning(f"⚠️ JSON响应解析失败，回退到HTML：{e}")
+                if self.json_available is None:
+                    # 探测时就解析不了，视为没有可用的JSON接口
+                    self.json_available = False
+            else:
+                if self.json_available is None:
+                    logging.info("⚡ 已启用JSON查询接口")
+                self.json_available = True
+                logging.info(f"✅ 成功获取订单JSON 第{page_num}页 ({len(response.content)} 字节)")
+                return True, result
+        elif response.status_code == 200:
+            # 接口返回的是HTML页面，说明没有JSON接口
+            if self.json_available is None:
+                logging.info("ℹ️ JSON查询接口不可用，回退到HTML解析")
+            self.json_available = False
+            if self.json_query_url == self.orders_url:
+                return True, self.parse_html_page(response, page_num, fingerprint)
+        elif self.json_available or self.json_query_url == self.orders_url:
+            # 已确认可用的接口临时出错，本页按失败处理，下次仍走JSON
+            return True, self.parse_html_page(response, page_num)
+        else:
+            # 单独配置的JSON接口探测时就返回错误状态（如404），之后不再请求，直接走HTML查询
+            logging.info(f"ℹ️ JSON查询接口返回 HTTP {response.status_code}，回退到HTML解析")
+            self.json_available = False
+        
+        return False, None
+    
+    def check_session(self, response):
+        """根据数据响应更新会话状态，被重定向到登录页时抛出SessionExpiredError"""
+        if is_login_response(response):
+            self.session_state.mark_invalid("查询被重定向到登录页")
+            raise SessionExpiredError("查询响应为登录页面")
+        if response.status_code == 200:
+            self.session_state.mark_valid()
+    
+    def _is_unchanged(self, fingerprint, digest):
+        """记录本次摘要，并判断与上次是否相同"""
+        fingerprint['digest'] = digest
+        if self.fingerprints.is_unchanged(fingerprint['window'], digest):
+            fingerprint['unchanged'] = True
+            logging.info(f"⏭️ 查询结果未变化，跳过解析（累计跳过 {self.fingerprints.skipped} 次）")
+            return True
+        return False
+    
+    def parse_html_page(self, response, page_num, fingerprint=None):
+        """解析HTML查询结果页"""
+        if response.status_code != 200:
+            logging.error(f"❌ 获取订单第{page_num}页失败：HTTP {response.status_code}")
+            return None
+        
+        if fingerprint is not None and self._is_unchanged(fingerprint, html_digest(response.text)):
+            return [], 0
+        
+        logging.info(f"✅ 成功获取订单页面 第{page_num}页 ({len(response.text)} 字符)")
+        return self.parse_orders(response.text), extract_total_count(response.text)
+    
     def parse_orders(self, html_content):
         """解析订单HTML内容"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
             orders = []
             
+            # 检查页面是否包含订单相关关键词（直接在原始HTML上查找，无需先构建文档树）
+            order_keywords = ['交易时间', '金额', '订单号', '支付方式', '交易状态', '商户订单号', '查询', '交易查询']
+            found_keywords = [kw for kw in order_keywords if kw in html_content]
+            
+            # 优先只解析结果表格中的订单行
+            if found_keywords:
+                table_orders = self._parse_table_rows(html_content)
+                if table_orders:
+                    logging.info(f"✅ 从表格解析到 {len(table_orders)} 条订单")
+                    return table_orders
+            
+            # 表格中没有订单时，回退到BeautifulSoup完整解析页面
+            soup = BeautifulSoup(html_content, 'html.parser')
+            
             # 智能解析页面内容 - 查找包含订单信息的文本
             page_text = soup.get_text()
             
@@ -174,34 +460,10 @@ class OrderScraperRequests:
             logging.info(f"📄 页面标题: {soup.title.string if soup.title else '无标题'}")
             logging.info(f"📄 页面前200字符: {page_text[:200]}")
             
-            # 检查页面是否包含订单相关关键词
-            order_keywords = ['交易时间', '金额', '订单号', '支付方式', '交易状态', '商户订单号', '查询', '交易查询']
-            found_keywords = [kw for kw in order_keywords if kw in page_text]
-            
             if found_keywords:
                 logging.info(f"📦 页面包含订单关键词: {', '.join(found_keywords)}")
                 
-                # 尝试解析JSON数据（很多现代网站使用AJAX加载数据）
-                script_tags = soup.find_all('script')
-                for script in script_tags:
-                    if script.string and ('data' in script.string or 'list' in script.string):
-                        try:
-                            # 尝试提取JSON数据
-                            import re
-                            json_matches = re.findall(r'\{[^{}]*"[^"]*"[^{}]*\}', script.string)
-                            for match in json_matches[:3]:  # 只检查前3个匹配
-                                try:
-                                    data = json.loads(match)
-                                    if isinstance(data, dict) and any(key in str(data).lower() for key in ['amount', 'order', 'trade']):
-                                        logging.info(f"📋 找到可能的订单JSON数据")
-                                        orders.append(data)
-                                except:
-                                    continue
-                        except:
-                            continue
-                
                 # 使用正则表达式查找金额模式
-                import re
                 amount_pattern = r'[\d,]+\.\d{2}'
                 amounts = re.findall(amount_pattern, page_text)
                 if amounts:
@@ -233,18 +495,72 @@ class OrderScraperRequests:
             logging.error(f"❌ 解析订单异常：{e}")
             return []
     
+    def _parse_table_rows(self, html_content):
+        """解析结果表格中的订单行"""
+        orders = []
+        for headers, rows in self.parser.iter_tables(html_content):
+            columns = self._map_columns(headers)
+            
+            for cells in rows:
+                order = self._row_to_order(cells, columns)
+                if order:
+                    orders.append(order)
+            
+            if orders:
+                break
+        return orders
+    
+    def _map_columns(self, headers):
+        """根据表头确定各字段所在列"""
+        columns = {}
+        for field, aliases in COLUMN_ALIASES.items():
+            for alias in aliases:
+                if alias in headers:
+                    columns[field] = headers.index(alias)
+                    break
+        if 'order_id' not in columns or 'amount' not in columns:
+            return dict(DEFAULT_COLUMNS)
+        return columns
+    
+    def _row_to_order(self, cells, columns):
+        """将一行单元格转换为订单字典"""
+        if len(cells) <= max(columns.values()):
+            return None
+        
+        order = {field: cells[index] for field, index in columns.items()}
+        if not order.get('order_id'):
+            return None
+        
+        amount_text = order.get('amount', '').replace('￥', '').replace('¥', '').replace(',', '')
+        try:
+            order['amount'] = float(amount_text)
+        except ValueError:
+            return None
+        
+        order['source'] = '通联支付'
+        return order
+    
     def query_orders(self):
         """主查询方法"""
+        self.last_order_count = 0
         try:
-            # 尝试登录
-            if not self.login_with_cookie():
+            # 会话在有效期内时不再单独探测
+            if not self.ensure_session():
                 logging.error("❌ 登录失败，无法继续查询")
                 return None
             
-            # 抓取今日订单
+            # 抓取今日订单，查询发现会话失效时重新登录后重试一次
             today = time.strftime("%Y-%m-%d")
-            orders = self.fetch_orders(today, today)
+            try:
+                orders = self.fetch_orders(today, today)
+            except SessionExpiredError:
+                logging.warning("⚠️ 查询时发现会话已失效，重新登录")
+                if not self.login():
+                    logging.error("❌ 重新登录失败，无法继续查询")
+                    return None
+                orders = self.fetch_orders(today, today)
             
+            self.last_order_count = len(orders)
             if orders:
                 logging.info(f"📦 成功抓取 {len(orders)} 条订单")
                 # 返回HTML内容用于兼容现有代码
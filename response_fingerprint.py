@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询响应指纹模块
+对查询结果中的订单表格区域做归一化哈希，按查询时间窗口记录最近一次的摘要，
+摘要未变化时可跳过解析和同步
+"""
+
+import re
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Optional
+
+_WHITESPACE = re.compile(r'\s+')
+_TOTAL_TEXT = re.compile(r'共\s*\d+\s*条')
+
+
+def result_region(html: str) -> str:
+    """截取结果表格区域（第一个<table>到最后一个</table>）及总条数文字"""
+    start = html.find('<table')
+    end = html.rfind('</table>')
+    region = html[start:end + len('</table>')] if start != -1 and end > start else ''
+    total = _TOTAL_TEXT.search(html)
+    if total:
+        region += total.group(0)
+    return _WHITESPACE.sub(' ', region)
+
+
+def html_digest(html: str) -> Optional[str]:
+    """HTML结果页的摘要，没有结果表格时返回None"""
+    region = result_region(html)
+    if not region:
+        return None
+    return hashlib.blake2b(region.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def json_digest(records: Any) -> str:
+    """JSON记录列表的摘要，忽略键顺序"""
+    text = json.dumps(records, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ResponseFingerprints:
+    def __init__(self, max_windows: int = 64):
+        self.logger = logging.getLogger(__name__)
+        self.max_windows = max_windows
+        self.digests = OrderedDict()
+        self.checked = 0
+        self.skipped = 0
+
+    def is_unchanged(self, window: str, digest: Optional[str]) -> bool:
+        """与该窗口上次记录的摘要比较，相同时计入跳过次数"""
+        self.checked += 1
+        if digest is None or self.digests.get(window) != digest:
+            return False
+        self.skipped += 1
+        self.digests.move_to_end(window)
+        return True
+
+    def remember(self, window: str, digest: Optional[str]):
+        """记录窗口的最新摘要，只保留最近的若干个窗口"""
+        if digest is None:
+            return
+        self.digests[window] = digest
+        self.digests.move_to_end(window)
+        while len(self.digests) > self.max_windows:
+            self.digests.popitem(last=False)
+
+    def forget(self, window: str):
+        """丢弃窗口摘要，下次必定重新解析"""
+        self.digests.pop(window, None)
+
+    def get_stats(self) -> dict:
+        return {'checked': self.checked, 'skipped': self.skipped}
@@ -8,7 +8,6 @@
 import os
 import sys
 import argparse
-from main import OrderSyncApp
 
 
 def main():
@@ -17,9 +16,34 @@ def main():
     parser.add_argument('--interval',
                         type=int,
                         default=10,
-                        help='循环间隔(秒)，默认10秒')
+                        help='初始循环间隔(秒)，默认10秒；之后按订单量自适应调整')
+    parser.add_argument('--fixed-interval',
+                        action='store_true',
+                        help='关闭自适应调度，始终使用 --interval 指定的间隔')
+    parser.add_argument('--browser', action='store_true',
+                        help='用Playwright浏览器抓取订单页面并上传截图（支持 --once/--interval/--fixed-interval）')
+    parser.add_argument('--backfill', action='store_true', help='补抓历史订单，需配合 --from/--to')
+    parser.add_argument('--from', dest='from_date', help='补抓开始日期 YYYY-MM-DD')
+    parser.add_argument('--to', dest='to_date', help='补抓结束日期 YYYY-MM-DD，默认与 --from 相同')
+    parser.add_argument('--chunk', choices=['day', 'hour'], help='补抓切分粒度，默认读取 config.json')
+    parser.add_argument('--workers', type=int, help='补抓并发数，默认读取 config.json')
+    parser.add_argument('--migrate-orders', action='store_true',
+                        help='把 orders_auto 中时间戳key的旧订单迁移为订单号key（多商户订单加商户ID前缀）')
+    parser.add_argument('--dry-run', action='store_true', help='配合 --migrate-orders，只统计不写入')
+    parser.add_argument('--rebuild-stats', action='store_true',
+                        help='从 orders_auto 和 sync_logs 重新计算 sync_stats 统计计数')
+    parser.add_argument('--cleanup-logs', action='store_true', help='分页删除超过保留天数的同步日志')
+    parser.add_argument('--days', type=int, help='配合 --cleanup-logs，日志保留天数，默认读取 config.json')
+    parser.add_argument('--by-key', action='store_true',
+                        help='配合 --cleanup-logs，按日志key查询（数据库未给timestamp建索引时使用）')
 
     args = parser.parse_args()
+    if args.backfill and not args.from_date:
+        parser.error('--backfill 需要指定 --from')
+
+    # 环境检查前先读取 .env
+    from dotenv import load_dotenv
+    load_dotenv()
 
     print("=" * 60)
     print("通联支付订单抓取工具")
@@ -61,24 +85,43 @@ def main():
     print("✅ 环境检查通过")
     print()
 
+    if args.backfill:
+        return run_backfill(args)
+    if args.migrate_orders:
+        return run_migrate_orders(args)
+    if args.rebuild_stats:
+        return run_rebuild_stats(args)
+    if args.cleanup_logs:
+        return run_cleanup_logs(args)
+
+    if args.browser:
+        return run_browser(args)
+
     # 创建并运行应用
     try:
+        from main import OrderSyncApp
         app = OrderSyncApp()
 
         if args.once:
             print("🔄 执行一次性抓取...")
             if app.initialize_services():
-                app.sync_orders()
+                try:
+                    app.sync_orders()
+                finally:
+                    app.close()
                 print("✅ 抓取完成")
             else:
                 print("❌ 服务初始化失败")
                 return 1
         else:
-            print(f"🔄 开始循环抓取，间隔 {args.interval} 秒...")
+            mode = "固定" if args.fixed_interval else "初始"
+            print(f"🔄 开始循环抓取，{mode}间隔 {args.interval} 秒...")
             print("按 Ctrl+C 停止")
 
             # 设置循环间隔
             os.environ['SYNC_INTERVAL'] = str(args.interval)
+            if args.fixed_interval:
+                os.environ['SYNC_ADAPTIVE'] = '0'
             app.run()
 
     except KeyboardInterrupt:
@@ -90,6 +133,120 @@ def main():
     return 0
 
 
-if __name__ == "__main__":
+def run_backfill(args):
+    """按时间块补抓历史订单，中断后重新运行同样的命令即可从检查点继续"""
+    import logging
+    from dotenv import load_dotenv
+    from backfill import Backfill
+    from firebase_sync import FirebaseSync
+    from product_matcher import ProductMatcher
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+
+    to_date = args.to_date or args.from_date
+    print(f"📚 补抓 {args.from_date} ~ {to_date} 的历史订单...")
+    try:
+        backfill = Backfill.from_config(FirebaseSync(), ProductMatcher(),
+                                        chunk=args.chunk, max_workers=args.workers)
+        summary = backfill.run(args.from_date, to_date)
+    except KeyboardInterrupt:
+        print("\n⏹️  补抓已中断，重新运行同样的命令会从检查点继续")
+        return 1
+    except Exception as e:
+        print(f"❌ 补抓出错: {str(e)}")
+        return 1
+
+    if summary['failed']:
+        print(f"⚠️ {len(summary['failed'])} 个时间块失败，重新运行同样的命令会只补抓这些时间块")
+        return 1
+    print(f"✅ 补抓完成，共 {summary['orders']} 条订单")
+    return 0
+
+
+def run_migrate_orders(args):
+    """一次性迁移旧的时间戳key订单，可先加 --dry-run 查看会迁移多少条"""
+    import logging
+    from dotenv import load_dotenv
+    from firebase_sync import FirebaseSync
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+
+    try:
+        stats = FirebaseSync().migrate_to_order_keys(dry_run=args.dry_run)
+    except Exception as e:
+        print(f"❌ 迁移出错: {str(e)}")
+        return 1
+
+    if stats['failed']:
+        print(f"⚠️ {stats['failed']} 条订单迁移失败，可以重新运行迁移")
+        return 1
+    print(f"✅ 迁移完成：迁移 {stats['moved']} 条，删除重复 {stats['duplicates']} 条")
+    return 0
+
+
+def run_rebuild_stats(args):
+    """全量重新计算统计计数，计数与订单数据不一致时使用，建议先停止同步"""
+    import logging
+    from dotenv import load_dotenv
+    from firebase_sync import FirebaseSync
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+
+    try:
+        totals = FirebaseSync().rebuild_statistics()
+    except Exception as e:
+        print(f"❌ 重建统计出错: {str(e)}")
+        return 1
+
+    print(f"✅ 统计已重建：共 {totals['orders']} 条订单，{totals['days']} 天，错误 {totals['errors']} 次")
+    return 0
+
+
+def run_browser(args):
+    """用持久浏览器循环抓取订单页面，截图经去重压缩后上传"""
     from order_scraper import run_scraper
-    run_scraper()
\ No newline at end of file
+
+    os.environ['SYNC_INTERVAL'] = str(args.interval)
+    if args.fixed_interval:
+        os.environ['SYNC_ADAPTIVE'] = '0'
+    print("🌐 使用浏览器抓取" + ("一次..." if args.once else f"，初始间隔 {args.interval} 秒，按 Ctrl+C 停止"))
+    try:
+        run_scraper(once=args.once)
+    except Exception as e:
+        print(f"❌ 浏览器抓取出错: {str(e)}")
+        return 1
+    return 0
+
+
+def run_cleanup_logs(args):
+    """前台执行一次旧日志清理，每删除一页打印进度"""
+    import logging
+    from dotenv import load_dotenv
+    from firebase_sync import FirebaseSync
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+
+    firebase = FirebaseSync()
+    try:
+        deleted = firebase.cleanup_old_logs(args.days, by='key' if args.by_key else 'timestamp')
+    except KeyboardInterrupt:
+        print(f"\n⏹️  清理已中断，已删除 {firebase.get_cleanup_progress()['deleted']} 条，重新运行会继续清理")
+        return 1
+    except Exception as e:
+        print(f"❌ 清理日志出错: {str(e)}")
+        return 1
+
+    progress = firebase.get_cleanup_progress()
+    if progress.get('error'):
+        print(f"⚠️ 清理未完成（已删除 {deleted} 条）：{progress['error']}")
+        return 1
+    print(f"✅ 已删除 {deleted} 条 {progress['cutoff'][:10]} 之前的同步日志")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
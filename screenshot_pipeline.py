@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图去重与压缩模块
+对每张截图计算感知哈希（dHash），与同类截图上一次保留的哈希差异很小时直接丢弃，不落盘也不上传；
+保留的截图重新编码为WebP或JPEG。
+Pillow已在pyproject.toml中声明为依赖；若运行环境缺失Pillow，则退化为按字节完全相同去重，并按原始PNG保存。
+"""
+
+import io
+import os
+import time
+import hashlib
+import logging
+from typing import Dict, Optional
+
+from utils.config import load_config_section
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DEFAULT_PIPELINE_CONFIG = {
+    'format': 'webp',
+    'quality': 60,
+    'hash_size': 8,
+    'max_distance': 4,
+}
+
+FORMAT_EXTENSIONS = {'webp': '.webp', 'jpeg': '.jpg', 'png': '.png'}
+
+
+def load_pipeline_config(config_file: str = 'config.json') -> Dict:
+    """读取screenshots配置段中的去重和压缩参数"""
+    return load_config_section('screenshots', DEFAULT_PIPELINE_CONFIG, config_file, known_only=True, name='截图压缩')
+
+
+def dhash(image, hash_size: int = 8) -> int:
+    """差异哈希：缩成 (hash_size+1) x hash_size 灰度图，逐行比较相邻像素亮度"""
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class ScreenshotPipeline:
+    def __init__(self, directory: str = 'screenshots', config: Optional[Dict] = None):
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.config = dict(DEFAULT_PIPELINE_CONFIG, **(config or {}))
+        self.format = str(self.config['format']).lower()
+        if self.format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"不支持的截图格式: {self.format}")
+        if Image is None and self.format != 'png':
+            self.logger.warning("未安装Pillow，截图按PNG原样保存，只去除完全相同的截图")
+            self.format = 'png'
+        self.quality = int(self.config['quality'])
+        self.hash_size = int(self.config['hash_size'])
+        self.max_distance = int(self.config['max_distance'])
+
+        # 每种截图（登录/抓单/报错）上一次保留的哈希
+        self.last_hashes: Dict[str, int] = {}
+        self.kept = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, directory: str = 'screenshots', config_file: str = 'config.json'):
+        return cls(directory, load_pipeline_config(config_file))
+
+    def _is_duplicate(self, kind: str, value: int, exact: bool) -> bool:
+        last = self.last_hashes.get(kind)
+        if last is None:
+            return False
+        if exact:
+            return last == value
+        return hamming_distance(last, value) <= self.max_distance
+
+    def _encode(self, image) -> bytes:
+        buffer = io.BytesIO()
+        if self.format == 'jpeg':
+            image.convert('RGB').save(buffer, 'JPEG', quality=self.quality, optimize=True)
+        elif self.format == 'webp':
+            image.save(buffer, 'WEBP', quality=self.quality, method=4)
+        else:
+            image.save(buffer, 'PNG', optimize=True)
+        return buffer.getvalue()
+
+    def _new_path(self, prefix: str) -> str:
+        """按秒命名，同一秒内多张截图时追加序号避免覆盖"""
+        base = os.path.join(self.directory, f"{prefix}_{int(time.time())}")
+        ext = FORMAT_EXTENSIONS[self.format]
+        path, n = base + ext, 1
+        while os.path.exists(path):
+            path, n = f"{base}_{n}{ext}", n + 1
+        return path
+
+    def save(self, png_bytes: bytes, kind: str, prefix: str = 'screenshot') -> Optional[str]:
+        """处理一张PNG截图：与上一张同类截图近似相同时返回None，否则压缩保存并返回文件路径"""
+        self.bytes_in += len(png_bytes)
+        if Image is None:
+            value = int.from_bytes(hashlib.blake2b(png_bytes, digest_size=8).digest(), 'big')
+            exact, image = True, None
+        else:
+            image = Image.open(io.BytesIO(png_bytes))
+            value = dhash(image, self.hash_size)
+            exact = False
+
+        if self._is_duplicate(kind, value, exact):
+            self.skipped += 1
+            self.logger.debug(f"{kind}截图与上一张相同，跳过")
+            return None
+
+        data = png_bytes if image is None else self._encode(image)
+        path = self._new_path(prefix)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.last_hashes[kind] = value
+        self.kept += 1
+        self.bytes_out += len(data)
+        return path
+
+    def get_stats(self) -> Dict:
+        total = self.kept + self.skipped
+        return {
+            'kept': self.kept,
+            'skipped': self.skipped,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'saved_ratio': round(1 - self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+            'skip_ratio': round(self.skipped / total, 3) if total else 0.0,
+        }
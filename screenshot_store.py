@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图存储模块
+为 screenshots/ 目录维护一个按时间和类型（登录/抓单/报错）排列的索引，持久化到 index.json。
+新增截图后按总字节数和保留天数淘汰最旧的文件；按抓取轮次或时间查找截图只查索引，不扫描目录。
+"""
+
+import os
+import re
+import json
+import time
+import bisect
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from utils.config import load_config_section, save_json_atomic
+
+DEFAULT_STORE_CONFIG = {
+    'max_total_mb': 200,
+    'max_age_days': 7,
+}
+
+INDEX_FILE = 'index.json'
+IMAGE_EXTENSIONS = ('.png', '.webp', '.jpg', '.jpeg')
+
+# 旧版本直接写入目录的截图文件名，例如 screenshot_orders_1750000000.png
+FILENAME_PATTERN = re.compile(r'^screenshot_(login|orders|error)_(\d+)')
+FILENAME_KINDS = {'login': '登录', 'orders': '抓单', 'error': '报错'}
+
+
+def load_store_config(config_file: str = 'config.json') -> Dict:
+    """读取screenshots配置段中的保留策略"""
+    return load_config_section('screenshots', DEFAULT_STORE_CONFIG, config_file, known_only=True, name='截图保留')
+
+
+class ScreenshotStore:
+    def __init__(self, directory: str = 'screenshots', config: Optional[Dict] = None):
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.config = dict(DEFAULT_STORE_CONFIG, **(config or {}))
+        self.max_bytes = float(self.config['max_total_mb']) * 1024 * 1024
+        self.max_age = float(self.config['max_age_days']) * 86400
+        self.index_path = os.path.join(directory, INDEX_FILE)
+
+        # entries按时间升序排列，times与之一一对应供二分查找
+        self.entries: List[Dict] = []
+        self.times: List[float] = []
+        self.by_cycle: Dict[str, List[Dict]] = {}
+        self.total_bytes = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        if not self.load():
+            self.rebuild()
+        self.prune()
+
+    @classmethod
+    def from_config(cls, directory: str = 'screenshots', config_file: str = 'config.json'):
+        return cls(directory, load_store_config(config_file))
+
+    def _insert(self, entry: Dict):
+        position = bisect.bisect_right(self.times, entry['time'])
+        self.entries.insert(position, entry)
+        self.times.insert(position, entry['time'])
+        if entry.get('cycle'):
+            self.by_cycle.setdefault(entry['cycle'], []).append(entry)
+        self.total_bytes += entry['bytes']
+
+    def load(self) -> bool:
+        """从index.json加载索引，文件不存在或损坏时返回False"""
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries', [])
+        except Exception as e:
+            self.logger.error(f"加载截图索引失败，重新扫描目录: {str(e)}")
+            return False
+        for entry in entries:
+            self._insert(entry)
+        return True
+
+    def rebuild(self):
+        """扫描目录重建索引，只在没有索引时执行一次（用于接管已有的截图）"""
+        self.entries, self.times, self.by_cycle, self.total_bytes = [], [], {}, 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.lower().endswith(IMAGE_EXTENSIONS) or not os.path.isfile(path):
+                continue
+            match = FILENAME_PATTERN.match(name)
+            stat = os.stat(path)
+            self._insert({
+                'path': path,
+                'kind': FILENAME_KINDS[match.group(1)] if match else 'other',
+                'time': float(match.group(2)) if match else stat.st_mtime,
+                'cycle': None,
+                'bytes': stat.st_size,
+            })
+        self.logger.info(f"已扫描截图目录: {len(self.entries)} 个文件，共 {self.total_bytes / 1024 / 1024:.1f}MB")
+        self.save()
+
+    def save(self):
+        """保存截图索引"""
+        try:
+            save_json_atomic(self.index_path, {'entries': self.entries})
+        except Exception as e:
+            self.logger.error(f"保存截图索引失败: {str(e)}")
+
+    def add(self, path: str, kind: str, cycle: Optional[str] = None) -> Dict:
+        """登记一张已写入磁盘的截图，随后按预算淘汰旧截图"""
+        entry = {
+            'path': path,
+            'kind': kind,
+            'time': time.time(),
+            'cycle': cycle,
+            'bytes': os.path.getsize(path),
+        }
+        with self._lock:
+            self._insert(entry)
+            self._prune()
+            self.save()
+        return entry
+
+    def _evict_oldest(self):
+        entry = self.entries.pop(0)
+        self.times.pop(0)
+        self.total_bytes -= entry['bytes']
+        if entry.get('cycle') in self.by_cycle:
+            remaining = [e for e in self.by_cycle[entry['cycle']] if e is not entry]
+            if remaining:
+                self.by_cycle[entry['cycle']] = remaining
+            else:
+                del self.by_cycle[entry['cycle']]
+        try:
+            os.remove(entry['path'])
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"删除截图失败 {entry['path']}: {str(e)}")
+        self.evicted += 1
+
+    def _prune(self) -> int:
+        cutoff = time.time() - self.max_age if self.max_age > 0 else None
+        removed = 0
+        # 至少保留最新的一张，便于排查当前问题
+        while len(self.entries) > 1 and (
+                (cutoff is not None and self.entries[0]['time'] < cutoff)
+                or (self.max_bytes > 0 and self.total_bytes > self.max_bytes)):
+            self._evict_oldest()
+            removed += 1
+        return removed
+
+    def prune(self) -> int:
+        """淘汰超过保留天数或超出总大小的最旧截图，返回删除数量"""
+        with self._lock:
+            removed = self._prune()
+            if removed:
+                self.logger.info(f"🧹 已清理 {removed} 张旧截图，当前 {self.total_bytes / 1024 / 1024:.1f}MB")
+                self.save()
+        return removed
+
+    def find_cycle(self, cycle: str) -> List[Dict]:
+        """返回某一轮抓取的全部截图"""
+        return list(self.by_cycle.get(cycle, []))
+
+    def find_at(self, timestamp: float, kind: Optional[str] = None) -> Optional[Dict]:
+        """返回某个时间点之前（含）最近的一张截图，可按类型过滤"""
+        position = bisect.bisect_right(self.times, timestamp)
+        for i in range(position - 1, -1, -1):
+            if kind is None or self.entries[i]['kind'] == kind:
+                return self.entries[i]
+        return None
+
+    def latest(self, kind: Optional[str] = None) -> Optional[Dict]:
+        return self.find_at(float('inf'), kind)
+
+    def get_stats(self) -> Dict:
+        return {
+            'files': len(self.entries),
+            'total_mb': round(self.total_bytes / 1024 / 1024, 2),
+            'evicted': self.evicted,
+        }
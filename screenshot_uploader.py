@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图后台上传模块
+抓取流程只负责把截图写到本地并放入队列，由后台线程上传到图床，失败时按指数退避重试。
+队列有长度上限，满了之后丢弃最旧的截图，保证抓取流程永远不会等待上传。
+上传目标可替换：默认上传到Imgur，配置 upload_url 后上传到该地址（例如本地测试服务）。
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from http_client import backoff_delay
+from image_uploader import ImageUploader, get_uploader
+from utils.config import load_config_section
+
+DEFAULT_UPLOAD_CONFIG = {
+    'upload_url': None,
+    'queue_size': 50,
+    'workers': 1,
+    'retry_times': 3,
+    'retry_delay': 2,
+    'retry_max_delay': 30,
+}
+
+
+def load_upload_config(config_file: str = 'config.json') -> Dict:
+    """读取screenshots配置段"""
+    return load_config_section('screenshots', DEFAULT_UPLOAD_CONFIG, config_file, name='截图上传')
+
+
+class ScreenshotUploadQueue:
+    def __init__(self, uploader: Optional[Callable[[str], Optional[str]]] = None,
+                 config: Optional[Dict] = None):
+        self.logger = logging.getLogger(__name__)
+        self.config = dict(DEFAULT_UPLOAD_CONFIG, **(config or {}))
+        if uploader is None:
+            uploader = ImageUploader(self.config['upload_url']) if self.config['upload_url'] else get_uploader()
+        self.uploader = uploader
+        self.retry_times = int(self.config['retry_times'])
+
+        self.queue = deque(maxlen=int(self.config['queue_size']))
+        self.results = deque(maxlen=100)
+        self.uploaded = 0
+        self.failed = 0
+        self.dropped = 0
+        self._active = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"screenshot-upload-{i}", daemon=True)
+            for i in range(max(1, int(self.config['workers'])))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_config(cls, uploader=None, config_file: str = 'config.json'):
+        return cls(uploader, load_upload_config(config_file))
+
+    def submit(self, path: str, kind: str = 'screenshot'):
+        """放入上传队列并立即返回；队列已满时丢弃最旧的一张"""
+        with self._cond:
+            if self._closed:
+                self.logger.warning(f"上传队列已关闭，跳过截图 {path}")
+                return
+            if len(self.queue) == self.queue.maxlen:
+                old_path, old_kind = self.queue[0]
+                self.dropped += 1
+                self.logger.warning(f"⚠️ 截图上传队列已满，丢弃最旧的{old_kind}截图 {old_path}")
+            self.queue.append((path, kind))
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self.queue and not self._closed:
+                    self._cond.wait()
+                if not self.queue:
+                    return
+                path, kind = self.queue.popleft()
+                self._active += 1
+            try:
+                self._upload(path, kind)
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify_all()
+
+    def _upload(self, path: str, kind: str):
+        for attempt in range(self.retry_times + 1):
+            try:
+                url = self.uploader(path)
+            except (ValueError, FileNotFoundError) as e:
+                # 配置错误（如未设置IMGUR_CLIENT_ID）或截图已被清理，重试也不会成功
+                self.logger.error(f"❌ {kind}截图上传失败：{e}")
+                break
+            except Exception as e:
+                url = None
+                self.logger.warning(f"{kind}截图上传异常：{e}")
+            if url:
+                self.uploaded += 1
+                self.results.append({'path': path, 'kind': kind, 'url': url, 'time': time.time()})
+                self.logger.info(f"📸 {kind}截图已上传：{url}")
+                return
+            if attempt < self.retry_times and not self._closed:
+                time.sleep(backoff_delay(self.config, attempt))
+        self.failed += 1
+        self.logger.error(f"❌ {kind}截图上传失败，已放弃：{path}")
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中的截图全部处理完，返回是否在超时前完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.queue or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = 10):
+        """尽量上传完剩余截图后停止后台线程"""
+        self.join(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def get_recent(self) -> List[Dict]:
+        return list(self.results)
+
+    def get_stats(self) -> Dict:
+        return {
+            'pending': len(self.queue),
+            'uploaded': self.uploaded,
+            'failed': self.failed,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登录会话状态模块
+根据真实查询的响应判断会话是否有效，只在会话空闲超过TTL后才发送探测请求
+"""
+
+import time
+import logging
+from urllib.parse import urlparse
+
+# 响应中出现这些内容说明被重定向到了登录页
+LOGIN_PAGE_MARKERS = ('商户登录', '账号登录', 'loginName')
+
+
+class SessionExpiredError(Exception):
+    """查询响应显示会话已失效"""
+
+
+def is_login_response(response) -> bool:
+    """判断响应是否为登录页（被重定向到/login或页面含登录表单）"""
+    if response.history and urlparse(str(response.url)).path.rstrip('/').endswith('/login'):
+        return True
+    content_type = response.headers.get('Content-Type', '').lower()
+    if 'json' in content_type:
+        return False
+    text = response.text
+    return any(marker in text for marker in LOGIN_PAGE_MARKERS)
+
+
+class SessionState:
+    def __init__(self, idle_ttl: float = 600):
+        self.logger = logging.getLogger(__name__)
+        self.idle_ttl = idle_ttl
+        self.valid = False
+        self.last_verified = 0.0
+        self.probe_count = 0
+        self.expired_count = 0
+
+    def mark_valid(self):
+        """真实请求成功后调用，刷新最近验证时间"""
+        self.valid = True
+        self.last_verified = time.time()
+
+    def mark_invalid(self, reason: str = ''):
+        if self.valid:
+            self.expired_count += 1
+            self.logger.warning(f"会话已失效{': ' + reason if reason else ''}")
+        self.valid = False
+
+    def is_fresh(self) -> bool:
+        """会话有效且空闲时间未超过TTL"""
+        return self.valid and time.time() - self.last_verified < self.idle_ttl
+
+    def needs_probe(self) -> bool:
+        """会话曾经有效但已空闲超过TTL，需要探测一次"""
+        return self.valid and not self.is_fresh()
@@ -0,0 +1,141 @@
+"""
+测试公共夹具：把仓库根目录加入导入路径，在临时目录中使用一份可修改的 config.json，
+并提供一个内存中的Firebase实时数据库引用（支持多路径update、服务端自增和按key/子节点范围查询）
+"""
+
+import os
+import sys
+import json
+import shutil
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class FakeQuery:
+    def __init__(self, ref, by=None):
+        self.ref, self.by = ref, by
+        self.start, self.end, self.limit = None, None, None
+
+    def _copy(self, **changes):
+        query = FakeQuery(self.ref, self.by)
+        query.start, query.end, query.limit = self.start, self.end, self.limit
+        for name, value in changes.items():
+            setattr(query, name, value)
+        return query
+
+    def start_at(self, value):
+        return self._copy(start=value)
+
+    def end_at(self, value):
+        return self._copy(end=value)
+
+    def limit_to_first(self, limit):
+        return self._copy(limit=limit)
+
+    def _value(self, key, node):
+        if self.by is None:
+            return key
+        return str(node.get(self.by, '')) if isinstance(node, dict) else ''
+
+    def get(self):
+        db = self.ref.db
+        db.calls.append(('query', self.ref.path))
+        if self.by is not None and self.by not in db.indexed:
+            raise RuntimeError(f'Index not defined, add ".indexOn": "{self.by}", for path "/{self.ref.path}"')
+        items = sorted((self.ref._node() or {}).items(), key=lambda item: self._value(*item))
+        items = [(key, node) for key, node in items
+                 if (self.start is None or self._value(key, node) >= self.start)
+                 and (self.end is None or self._value(key, node) <= self.end)]
+        return dict(items[:self.limit])
+
+
+class FakeRef:
+    def __init__(self, db, path=''):
+        self.db, self.path = db, path.strip('/')
+
+    def child(self, path):
+        return FakeRef(self.db, f"{self.path}/{path}")
+
+    def _node(self, create=False):
+        node = self.db.data
+        for part in filter(None, self.path.split('/')):
+            if not isinstance(node, dict) or (part not in node and not create):
+                return None
+            node = node.setdefault(part, {})
+        return node
+
+    def get(self, shallow=False):
+        self.db.calls.append(('get', self.path))
+        node = self._node()
+        if shallow and isinstance(node, dict):
+            return {key: True for key in node}
+        return node
+
+    def _set(self, value):
+        parent, _, key = self.path.rpartition('/')
+        node = FakeRef(self.db, parent)._node(create=True)
+        if value is None:
+            node.pop(key, None)
+        else:
+            node[key] = value
+
+    def update(self, values):
+        self.db.calls.append(('update', self.path))
+        if self.db.fail:
+            self.db.fail -= 1
+            raise RuntimeError('写入失败（模拟）')
+        for rule in self.db.reject:
+            if any(rule in path for path in values):
+                raise RuntimeError(f'拒绝写入（模拟）: {rule}')
+        for path, value in values.items():
+            ref = self.child(path)
+            if isinstance(value, dict) and '.sv' in value:
+                value = (ref._node() or 0) + value['.sv']['increment']
+            ref._set(value)
+
+    def order_by_key(self):
+        return FakeQuery(self)
+
+    def order_by_child(self, child):
+        return FakeQuery(self, child)
+
+
+class FakeDatabase:
+    """内存数据库；fail 为接下来要失败的update次数，reject 中的片段出现在路径里时该update被拒绝"""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+        self.fail = 0
+        self.reject = set()
+        self.indexed = set()
+
+    def reference(self):
+        return FakeRef(self)
+
+    def count(self, kind):
+        return sum(1 for call in self.calls if call[0] == kind)
+
+
+@pytest.fixture
+def fake_db():
+    return FakeDatabase()
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """在临时目录中运行，返回修改 config.json 配置段的函数"""
+    shutil.copy(os.path.join(ROOT, 'config.json'), tmp_path / 'config.json')
+    monkeypatch.chdir(tmp_path)
+
+    def update(section, **values):
+        path = tmp_path / 'config.json'
+        data = json.loads(path.read_text(encoding='utf-8'))
+        data.setdefault(section, {}).update(values)
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+    return update
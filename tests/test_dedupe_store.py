@@ -0,0 +1,64 @@
+import json
+from datetime import datetime, timedelta
+
+from dedupe_store import SyncedOrderStore, order_day
+
+
+def days_ago(days):
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def test_order_day():
+    assert order_day('2025-07-01 10:00:00') == '2025-07-01'
+    assert order_day(None) == datetime.now().strftime('%Y-%m-%d')
+
+
+def test_membership_and_expiry(tmp_path):
+    store = SyncedOrderStore(str(tmp_path / 'synced.db'), retention_days=3)
+    store.add_many(['TODAY'])
+    store.add_many(['OLD'], days_ago(5))
+    assert 'TODAY' in store and 'OLD' in store
+
+    assert store.expire() == 1
+    assert 'OLD' not in store
+    assert 'TODAY' in store
+    assert store.is_expired_day(days_ago(5))
+    assert not store.is_expired_day(days_ago(2))
+    store.close()
+
+
+def test_survives_reopen(tmp_path):
+    path = str(tmp_path / 'synced.db')
+    store = SyncedOrderStore(path)
+    store.add_many(['A', 'B'])
+    store.set_meta('order_index_loaded_at', 'now')
+    store.close()
+
+    store = SyncedOrderStore(path)
+    assert len(store) == 2
+    assert store.get_meta('order_index_loaded_at') == 'now'
+    store.close()
+
+
+def test_pending_rows(tmp_path):
+    path = str(tmp_path / 'synced.db')
+    store = SyncedOrderStore(path)
+    store.add_pending([('A', json.dumps({'order_id': 'A'})), ('B', json.dumps({'order_id': 'B'}))])
+    store.mark_pending_failed(['A'])
+    store.mark_pending_failed(['A'])
+    # 重新登记只更新内容，不清零失败次数
+    store.add_pending([('A', json.dumps({'order_id': 'A', 'amount': 1}))])
+
+    rows = {key: (json.loads(payload), attempts) for key, payload, attempts in store.load_pending(10)}
+    assert rows['A'] == ({'order_id': 'A', 'amount': 1}, 2)
+    assert rows['B'] == ({'order_id': 'B'}, 0)
+    assert [key for key, _, _ in store.load_pending(10)] == ['A', 'B']
+    assert len(store.load_pending(1)) == 1
+
+    store.remove_pending(['B'])
+    store.close()
+
+    store = SyncedOrderStore(path)
+    assert store.count_pending() == 1
+    assert store.load_pending(10)[0][0] == 'A'
+    store.close()
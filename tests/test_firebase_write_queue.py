@@ -0,0 +1,123 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('firebase_admin')
+
+from firebase_sync import FirebaseSync  # noqa: E402
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def make_orders(count, prefix='O', day=None):
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    return [{'order_id': f'{prefix}{i:04d}', 'create_time': f'{day} 10:00:00', 'amount': '1.50'}
+            for i in range(count)]
+
+
+@pytest.fixture
+def make_sync(config, fake_db, monkeypatch):
+    """返回创建FirebaseSync的函数，连接到内存数据库；测试结束时关闭全部实例"""
+    config('firebase', batch_retry_times=0, flush_linger=0.01, pending_retry_interval=0.2,
+           pending_isolate_attempts=2)
+    monkeypatch.setattr(FirebaseSync, '_initialize_firebase',
+                        lambda self: setattr(self, 'db_ref', fake_db.reference()))
+    created = []
+
+    def make():
+        sync = FirebaseSync()
+        created.append(sync)
+        return sync
+
+    yield make
+    for sync in created:
+        if not sync._closing:
+            sync.close()
+
+
+def test_enqueue_flush_writes_orders_stats_and_one_log(make_sync, fake_db):
+    sync = make_sync()
+    assert sync.enqueue_orders(make_orders(250)) == 250
+    assert sync.flush(timeout=5)
+
+    assert len(fake_db.data['orders_auto']) == 250
+    assert len(fake_db.data['order_ids']) == 250
+    assert fake_db.data['sync_stats']['totals']['orders'] == 250
+    logs = fake_db.data['sync_logs']
+    assert len(logs) == 1
+    assert next(iter(logs.values()))['success'] == 250
+
+    stats = sync.get_write_stats()
+    assert stats['flushed'] == 250
+    assert stats['retried'] == 0
+    assert stats['pending'] == 0
+
+
+def test_resync_does_not_double_count(make_sync, fake_db):
+    sync = make_sync()
+    sync.enqueue_orders(make_orders(5))
+    sync.flush(timeout=5)
+    sync.enqueue_orders(make_orders(5))
+    sync.flush(timeout=5)
+    assert fake_db.data['sync_stats']['totals']['orders'] == 5
+
+
+def test_failed_writes_stay_pending_and_are_retried(make_sync, fake_db):
+    sync = make_sync()
+    fake_db.fail = 1
+    sync.enqueue_orders(make_orders(10))
+    sync.flush(timeout=5)
+    assert sync.get_write_stats()['pending'] == 10
+
+    assert wait_until(lambda: sync.get_write_stats()['pending'] == 0)
+    assert len(fake_db.data['orders_auto']) == 10
+    assert sync.get_write_stats()['retried'] == 10
+
+
+def test_close_keeps_pending_orders_for_next_start(make_sync, fake_db):
+    sync = make_sync()
+    fake_db.fail = 10 ** 6
+    sync.enqueue_orders(make_orders(30))
+    sync.close()
+    assert 'orders_auto' not in fake_db.data
+
+    fake_db.fail = 0
+    restarted = make_sync()
+    assert restarted.get_write_stats()['pending'] == 30
+    restarted.enqueue_orders(make_orders(2, prefix='N'))
+    assert wait_until(lambda: restarted.get_write_stats()['pending'] == 0)
+    assert len(fake_db.data['orders_auto']) == 32
+    assert restarted.get_write_stats()['retried'] == 30
+
+
+def test_rejected_order_is_written_alone(make_sync, fake_db):
+    sync = make_sync()
+    fake_db.reject.add('/BAD')
+    sync.enqueue_orders(make_orders(20) + [{'order_id': 'BAD', 'amount': 1}])
+
+    assert wait_until(lambda: len(fake_db.data.get('orders_auto', {})) == 20
+                      and sync.get_write_stats()['pending'] == 1)
+    assert [key for key, _, _ in sync.synced_orders.load_pending(10)] == ['BAD']
+    assert 'BAD' in sync._isolated
+
+
+def test_old_orders_checked_with_one_query(make_sync, fake_db):
+    sync = make_sync()
+    old_day = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    orders = make_orders(20, day=old_day)
+    fake_db.data['order_ids'] = {order['order_id']: order['order_id'] for order in orders[:10]}
+    fake_db.calls.clear()
+
+    results = sync.sync_multiple_orders(orders)
+    assert results['skipped'] == 10
+    assert results['success'] == 10
+    assert fake_db.count('query') == 1
+    assert fake_db.count('get') <= 1  # 首次导入订单号索引
@@ -0,0 +1,50 @@
+from order_cursor import OrderCursor
+
+
+def order(order_id, create_time):
+    return {'order_id': order_id, 'create_time': create_time}
+
+
+def test_advance_keeps_ids_on_boundary(tmp_path):
+    cursor = OrderCursor(str(tmp_path / 'cursor.json'))
+    assert cursor.advance([order('A', '2025-07-01 10:00:00'), order('B', '2025-07-01 10:00:05'),
+                           order('C', '2025-07-01 10:00:05')])
+    assert cursor.last_time == '2025-07-01 10:00:05'
+    assert cursor.ids_at_last_time == {'B', 'C'}
+    assert not cursor.advance([order('A', '2025-07-01 10:00:00'), order('B', '2025-07-01 10:00:05')])
+
+
+def test_filter_new_keeps_unseen_orders_in_same_second(tmp_path):
+    cursor = OrderCursor(str(tmp_path / 'cursor.json'))
+    cursor.advance([order('A', '2025-07-01 10:00:05')])
+    orders = [order('X', '2025-07-01 09:59:59'), order('A', '2025-07-01 10:00:05'),
+              order('B', '2025-07-01 10:00:05'), order('C', '2025-07-01 10:00:06')]
+    assert [o['order_id'] for o in cursor.filter_new(orders)] == ['B', 'C']
+
+
+def test_window_start_only_for_cursor_day(tmp_path):
+    cursor = OrderCursor(str(tmp_path / 'cursor.json'))
+    assert cursor.window_start('2025-07-01') is None
+    cursor.advance([order('A', '2025-07-01 10:00:05')])
+    assert cursor.window_start('2025-07-01') == '2025-07-01 10:00:05'
+    assert cursor.window_start('2025-07-02') is None
+
+
+def test_save_and_reload(tmp_path):
+    path = str(tmp_path / 'cursor.json')
+    cursor = OrderCursor(path)
+    cursor.advance([order('A', '2025-07-01 10:00:05'), order('B', '2025-07-01 10:00:05')])
+    cursor.save()
+
+    reloaded = OrderCursor(path)
+    assert reloaded.last_time == '2025-07-01 10:00:05'
+    assert reloaded.ids_at_last_time == {'A', 'B'}
+    assert not (tmp_path / 'cursor.json.tmp').exists()
+
+
+def test_corrupt_file_resets(tmp_path):
+    path = tmp_path / 'cursor.json'
+    path.write_text('{not json', encoding='utf-8')
+    cursor = OrderCursor(str(path))
+    assert cursor.last_time is None
+    assert cursor.ids_at_last_time == set()
@@ -0,0 +1,106 @@
+import asyncio
+
+from order_paginator import OrderPaginator, extract_total_count
+
+
+def portal(total, rows_per_page, failing=(), report_total=True):
+    """模拟分页接口：每页最多返回rows_per_page条，failing中的页返回None"""
+    orders = [{'order_id': f'O{i:04d}'} for i in range(total)]
+    calls = []
+
+    def fetch_page(page_num):
+        calls.append(page_num)
+        if page_num in failing:
+            return None
+        start = (page_num - 1) * rows_per_page
+        return orders[start:start + rows_per_page], total if report_total else None
+
+    async def fetch_page_async(page_num):
+        return fetch_page(page_num)
+
+    return fetch_page, fetch_page_async, calls
+
+
+def fetch_both(paginator, total, rows_per_page, **kwargs):
+    stop_when = kwargs.pop('stop_when', None)
+    fetch_page, fetch_page_async, _ = portal(total, rows_per_page, **kwargs)
+    result = paginator.fetch_all(fetch_page, stop_when)
+    async_result = asyncio.run(paginator.fetch_all_async(fetch_page_async, stop_when))
+    return result, async_result
+
+
+def test_extract_total_count():
+    assert extract_total_count('<div>共 123 条</div>') == 123
+    assert extract_total_count('{"totalCount": "45"}') == 45
+    assert extract_total_count('<div>nothing</div>') is None
+
+
+def test_single_short_page_is_complete():
+    paginator = OrderPaginator(page_size=50)
+    for orders, complete in fetch_both(paginator, 30, 50):
+        assert len(orders) == 30
+        assert complete
+
+
+def test_fetches_all_pages():
+    paginator = OrderPaginator(page_size=50, max_workers=3)
+    for orders, complete in fetch_both(paginator, 175, 50):
+        assert [o['order_id'] for o in orders] == [f'O{i:04d}' for i in range(175)]
+        assert complete
+
+
+def test_portal_capping_page_size_uses_actual_rows():
+    paginator = OrderPaginator(page_size=50)
+    for orders, complete in fetch_both(paginator, 95, 20):
+        assert len(orders) == 95
+        assert complete
+
+
+def test_truncated_at_max_pages_is_incomplete():
+    paginator = OrderPaginator(page_size=50, max_pages=3)
+    for orders, complete in fetch_both(paginator, 500, 50):
+        assert len(orders) == 150
+        assert not complete
+
+
+def test_failed_page_is_incomplete():
+    paginator = OrderPaginator(page_size=50)
+    for orders, complete in fetch_both(paginator, 175, 50, failing={3}):
+        assert len(orders) == 125
+        assert not complete
+
+
+def test_stop_when_drops_later_pages_and_counts_as_complete():
+    paginator = OrderPaginator(page_size=50, max_pages=3)
+    seen = {'O0060'}
+    stop_when = lambda page: any(o['order_id'] in seen for o in page)
+    for orders, complete in fetch_both(paginator, 500, 50, stop_when=stop_when):
+        assert len(orders) == 100
+        assert complete
+
+
+def test_stop_on_first_page_skips_other_pages():
+    fetch_page, _, calls = portal(500, 50)
+    orders, complete = OrderPaginator(page_size=50).fetch_all(fetch_page, lambda page: True)
+    assert calls == [1]
+    assert len(orders) == 50
+    assert complete
+
+
+def test_unknown_total_fetches_sequentially():
+    paginator = OrderPaginator(page_size=50)
+    for orders, complete in fetch_both(paginator, 120, 50, report_total=False):
+        assert len(orders) == 120
+        assert complete
+
+    paginator = OrderPaginator(page_size=50, max_pages=2)
+    for orders, complete in fetch_both(paginator, 120, 50, report_total=False):
+        assert len(orders) == 100
+        assert not complete
+
+
+def test_duplicates_across_pages_are_removed():
+    pages = {1: [{'order_id': 'A'}, {'order_id': 'B'}], 2: [{'order_id': 'B'}, {'order_id': 'C'}]}
+    orders, complete = OrderPaginator(page_size=2).fetch_all(lambda n: (pages.get(n, []), 4))
+    assert [o['order_id'] for o in orders] == ['A', 'B', 'C']
+    assert complete
@@ -0,0 +1,78 @@
+from order_scraper_requests import OrderScraperRequests
+
+DAY = '2025-07-01'
+HEADER = ('<tr><th>商户订单号</th><th>终端</th><th>交易时间</th><th>支付方式</th>'
+          '<th>交易金额</th><th>交易状态</th></tr>')
+
+
+def order_page(rows):
+    body = ''.join(f'<tr><td>{order_id}</td><td>T1</td><td>{DAY} {clock}</td><td>微信</td>'
+                   f'<td>￥20.00</td><td>成功</td></tr>' for order_id, clock in rows)
+    return (f'<html><title>交易查询</title><body>交易查询<table><thead>{HEADER}</thead>'
+            f'<tbody>{body}</tbody></table><div>共 {len(rows)} 条</div></body></html>')
+
+
+class StubResponse:
+    def __init__(self, text, status_code=200, content_type='text/html', url='https://cus.allinpay.com/tranx/search'):
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.status_code = status_code
+        self.headers = {'Content-Type': content_type}
+        self.url = url
+        self.history = []
+
+    def json(self):
+        raise ValueError('not json')
+
+
+class StubSession:
+    """按URL返回预设响应，记录请求的URL和参数"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.requests.append((url, dict(params or {})))
+        return self.routes[url]()
+
+
+def make_scraper(config, routes, **scraper_config):
+    config('scraper', json_fast_path=False, **scraper_config)
+    scraper = OrderScraperRequests()
+    scraper.session = StubSession(routes)
+    return scraper
+
+
+def test_cursor_advances_only_after_commit(config):
+    rows = [('A1', '10:00:00'), ('A2', '10:05:00')]
+    scraper = make_scraper(config, {})
+    scraper.session.routes[scraper.orders_url] = lambda: StubResponse(order_page(rows))
+
+    orders = scraper.fetch_orders(DAY, DAY)
+    assert [o['order_id'] for o in orders] == ['A1', 'A2']
+    assert scraper.cursor.last_time is None
+
+    # 没有提交就重新抓取：从原来的游标开始，订单仍会返回
+    assert len(scraper.fetch_orders(DAY, DAY)) == 2
+    scraper.commit_cursor()
+    assert scraper.cursor.last_time == f'{DAY} 10:05:00'
+
+    rows.append(('A3', '10:06:00'))
+    orders = scraper.fetch_orders(DAY, DAY)
+    assert [o['order_id'] for o in orders] == ['A3']
+    assert scraper.session.requests[-1][1]['transTimeBegin'] == f'{DAY} 10:05:00'
+
+
+def test_missing_json_endpoint_is_probed_once(config):
+    json_url = 'https://cus.allinpay.com/api/tranx/query'
+    scraper = make_scraper(config, {}, json_query_url=json_url)
+    scraper.json_available = None
+    scraper.session.routes[json_url] = lambda: StubResponse('not found', status_code=404, url=json_url)
+    scraper.session.routes[scraper.orders_url] = lambda: StubResponse(order_page([('A1', '10:00:00')]))
+
+    for page_num in (1, 2, 3):
+        scraper._fetch_page({'pageNum': page_num})
+
+    assert scraper.json_available is False
+    assert [url for url, _ in scraper.session.requests].count(json_url) == 1
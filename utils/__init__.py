@@ -1 +1,10 @@
-# utils/__init__.py
\ No newline at end of file
+# utils/__init__.py
+
+
+def upload_to_imgur(image_path):
+    # 延迟导入：http_client 等底层模块会导入 utils.config，避免循环导入
+    from image_uploader import get_uploader
+    link = get_uploader().upload(image_path)
+    if not link:
+        raise Exception("Imgur 上传失败：响应中没有图片链接")
+    return link
@@ -0,0 +1,38 @@
+"""
+配置段读取与JSON文件原子保存的公共函数
+"""
+
+import os
+import json
+import logging
+from typing import Dict, Optional
+
+
+def load_config_section(section: str, defaults: Optional[Dict] = None, config_file: str = 'config.json',
+                        known_only: bool = False, name: str = '') -> Dict:
+    """读取config.json中的一个配置段并与defaults合并
+
+    known_only 为True时只取defaults中已有的key，且忽略值为None的项；否则整段覆盖默认值。
+    读取失败时记录错误（name用于日志，如"调度"）并返回默认值的副本。
+    """
+    config = dict(defaults or {})
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            values = json.load(f).get(section, {})
+        if known_only:
+            for key in config:
+                if values.get(key) is not None:
+                    config[key] = values[key]
+        else:
+            config.update(values)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"加载{name or section}配置失败: {str(e)}")
+    return config
+
+
+def save_json_atomic(path: str, data, **dump_options):
+    """先写临时文件再替换，中断时不会留下写了一半的文件；失败时抛出异常，由调用方记录"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **dump_options)
+    os.replace(tmp_path, path)